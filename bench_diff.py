@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+# BlenderFDS, an open tool for the NIST Fire Dynamics Simulator
+# Copyright (C) 2013  Emanuele Gissi, http://www.blenderfds.org
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""!
+Benchmark the text diff of compare against difflib.Differ,
+on the largest reference files with some lines changed.
+"""
+
+import sys, os, difflib, time
+
+sys.path.insert(0, os.path.dirname(__file__))
+from lib import diff
+
+TEST_PATH = "./tests/"
+QTY = 5  # largest files
+CHANGES = (  # (change one line every, in the first lines)
+    (200, None),
+    (20, None),
+    (5, None),
+    (1, 100),
+    (1, 300),
+)
+
+
+def _differ(a, b):
+    a = [l for l in a if not l.startswith("!")]
+    b = [l for l in b if not l.startswith("!")]
+    return [
+        l for l in difflib.Differ().compare(a, b) if l[0] in "-+"
+    ]  # "?" and " " excluded
+
+
+def _time(f, *args):
+    t0 = time.perf_counter()
+    f(*args)
+    return time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    filepaths = [
+        os.path.join(p, f)
+        for p, _, files in os.walk(TEST_PATH)
+        for f in files
+        if f.endswith(".fds") or f.endswith(".ge1")
+    ]
+    filepaths.sort(key=os.path.getsize, reverse=True)
+    print(
+        f"{'file':<36} {'lines':>6} {'every':>6} {'first':>6} {'Differ s':>9} {'diff s':>9} {'speedup':>8}"
+    )
+    for filepath in filepaths[:QTY]:
+        with open(filepath, "r") as f:
+            a = f.read().splitlines()
+        for every, first in CHANGES:
+            first = first or len(a)
+            b = [
+                l if i % every or i >= first else l + " 1.0E-6"
+                for i, l in enumerate(a)
+            ]
+            t_differ = _time(_differ, a, b)
+            t_diff = _time(diff.diff_lines, a, b)
+            print(
+                f"{os.path.basename(filepath)[:36]:<36} {len(a):>6} {every:>6} {first:>6} "
+                f"{t_differ:>9.3f} {t_diff:>9.3f} {t_differ / t_diff:>7.0f}x"
+            )
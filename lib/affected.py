@@ -0,0 +1,113 @@
+"""!
+Select the test modules and cases affected by the changes since a git base ref.
+"""
+
+import os, subprocess, importlib.util
+from .cases import ROOT_PATH
+
+## Changes to these paths affect all tests
+HARNESS_PATHS = (
+    os.path.join(ROOT_PATH, "lib"),
+    os.path.join(ROOT_PATH, "verify.py"),
+)
+
+
+def _git(path, *args):
+    c = subprocess.run(
+        ["git", "-C", path, *args],
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+    )
+    if c.returncode:
+        return None
+    return c.stdout.splitlines()
+
+
+def get_toplevel(path, toplevels):
+    """!
+    Get the git work tree of path, memoized by dir in toplevels.
+    """
+    path = os.path.isdir(path) and path or os.path.dirname(path)
+    while path not in toplevels and not os.path.isdir(path):  # not existing yet
+        path = os.path.dirname(path)
+    if path not in toplevels:
+        lines = _git(path, "rev-parse", "--show-toplevel")
+        toplevels[path] = lines and os.path.abspath(lines[0]) or None
+    return toplevels[path]
+
+
+def get_changed_files(base_ref, paths) -> set:
+    """!
+    Get the files changed since base_ref, including uncommitted and untracked,
+    in the git work trees of this repo and of paths.
+    External work trees not knowing base_ref contribute their uncommitted changes.
+    """
+    toplevels = dict()
+    repos = {get_toplevel(ROOT_PATH, toplevels)}
+    repos.update(get_toplevel(p, toplevels) for p in paths)
+    changed = set()
+    for repo in repos:
+        if not repo:
+            continue
+        lines = _git(repo, "diff", "--name-only", base_ref, "--")
+        if lines is None:
+            lines = _git(repo, "diff", "--name-only", "HEAD", "--") or list()
+        lines.extend(_git(repo, "ls-files", "--others", "--exclude-standard") or ())
+        changed.update(os.path.join(repo, os.path.normpath(l)) for l in lines)
+    return changed
+
+
+def get_unchanged_files(repo) -> set:
+    """!
+    Get the tracked files without uncommitted changes in the git work tree repo.
+    """
+    changed = _git(repo, "diff", "--name-only", "HEAD", "--")
+    if changed is None:  # eg. no commits yet
+        return set()
+    changed = set(changed)
+    return {
+        os.path.join(repo, os.path.normpath(l))
+        for l in _git(repo, "ls-files") or ()
+        if l not in changed
+    }
+
+
+def _is_changed(path, changed) -> bool:
+    """!
+    Check if path, or any file in it, is changed.
+    """
+    prefix = path.rstrip(os.sep) + os.sep
+    return any(f == path or f.startswith(prefix) for f in changed)
+
+
+def select(modules, collected, base_ref):
+    """!
+    Select the modules and their collected cases affected by the changes since base_ref.
+    Modules without cases are affected by any change in their dir.
+    Return the selected modules and collected cases.
+    """
+    paths = [d for deps in collected.values() for ds in deps.values() for d in ds]
+    changed = get_changed_files(base_ref, paths)
+    if any(_is_changed(p, changed) for p in HARNESS_PATHS):
+        return modules, collected
+    selected_modules, selected = list(), dict()
+    for m in modules:
+        module_filepath = importlib.util.find_spec(m).origin
+        keys = collected.get(m)
+        if _is_changed(module_filepath, changed):  # test script
+            selected_modules.append(m)
+            selected[m] = keys
+        elif keys:
+            keys = {
+                k: ds
+                for k, ds in keys.items()
+                if any(_is_changed(d, changed) for d in ds)
+            }
+            if keys:
+                selected_modules.append(m)
+                selected[m] = keys
+        elif _is_changed(os.path.dirname(module_filepath), changed):
+            selected_modules.append(m)
+            selected[m] = keys
+    return selected_modules, selected
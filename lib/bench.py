@@ -0,0 +1,128 @@
+"""!
+Benchmark the BlenderFDS import and export time of each case over repeated runs,
+against a saved baseline.
+"""
+
+import datetime, importlib, json, os, statistics, sys
+from collections import defaultdict
+from pathlib import Path
+from . import config, testing, timing
+from .bcolors import HEADER, ENDC, OKGREEN, FAIL
+
+## Format version of the history and baseline entries
+VERSION = 1
+
+## Benchmarked phases
+PHASES = ("from_fds", "to_fds")
+
+
+def _get_env() -> dict:
+    bpy, bf = sys.modules.get("bpy"), sys.modules.get("blenderfds")
+    return {
+        "blender": bpy and bpy.app.version_string or None,
+        "blenderfds": bf and repr(getattr(bf, "bl_info", {}).get("version")) or None,
+    }
+
+
+def _mad(samples) -> float:
+    m = statistics.median(samples)
+    return statistics.median(abs(s - m) for s in samples)
+
+
+def get_samples(tests, keys) -> dict:
+    """!
+    Run the test modules keys repeatedly, after warmup,
+    and get the samples of the wall time of each phase, by case.
+    """
+    samples = defaultdict(lambda: defaultdict(list))  # case: phase: samples
+    for i in range(config.BENCH_WARMUP + config.BENCH_REPEATS):
+        kind = i < config.BENCH_WARMUP and "warmup" or "timed"
+        print(f"\n{HEADER}Bench run {i + 1}, {kind}...{ENDC}")
+        for key in keys:
+            results = testing.run_module(tests[key])
+            if i < config.BENCH_WARMUP:
+                continue
+            for case, timings in timing.get_cases(results).items():
+                walls = defaultdict(float)
+                for name, wall, _ in timings:
+                    if name in PHASES:
+                        walls[name] += wall
+                for name, wall in walls.items():
+                    samples[case][name].append(wall)
+    return samples
+
+
+def compare(baseline, entry) -> list:
+    """!
+    Compare entry to baseline, and return the lines of the regressions.
+    A case phase regresses when its median is slower by over config.BENCH_THRESHOLD
+    and by over config.BENCH_NOISE median absolute deviations.
+    The aggregate regresses when the total of the common medians is slower
+    by over config.BENCH_THRESHOLD.
+    """
+    lines, t0, t1 = list(), 0.0, 0.0
+    for case, phases in entry["cases"].items():
+        for name, samples in phases.items():
+            ref_samples = baseline["cases"].get(case, dict()).get(name)
+            if not ref_samples:
+                continue
+            m0, m1 = statistics.median(ref_samples), statistics.median(samples)
+            t0, t1 = t0 + m0, t1 + m1
+            noise = config.BENCH_NOISE * (_mad(ref_samples) + _mad(samples))
+            if m1 > m0 * (1.0 + config.BENCH_THRESHOLD) and m1 - m0 > max(
+                noise, config.BENCH_MIN_DELTA
+            ):
+                lines.append(
+                    f"{case} {name}: {m0:.4f} s -> {m1:.4f} s (+{m1 / m0 - 1.0:.0%})"
+                )
+    if t0 and t1 > t0 * (1.0 + config.BENCH_THRESHOLD):
+        lines.append(f"Aggregate: {t0:.3f} s -> {t1:.3f} s (+{t1 / t0 - 1.0:.0%})")
+    return lines
+
+
+def run_bench(test_py_module, requested_test_names=None, set_baseline=False) -> int:
+    """!
+    Benchmark tests from test_py_module, append the results to the history file,
+    and compare them to the baseline, or set it.
+    Return the exit code: 1 if regressed, 0 otherwise.
+    """
+    config.CACHE, config.RUN_FDS, config.SET_REF = False, False, False
+    keys = list(testing.get_requested(test_py_module, requested_test_names))
+    tests = {k: importlib.import_module(k) for k in keys}
+    print(f"{HEADER}Benchmarked tests:{ENDC}")
+    print("  " + "\n  ".join(keys))
+    entry = {
+        "version": VERSION,
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        **_get_env(),
+        "cases": get_samples(tests, keys),
+    }
+
+    # History
+    Path(config.BENCH_PATH).mkdir(parents=True, exist_ok=True)
+    with open(os.path.join(config.BENCH_PATH, "history.jsonl"), "a") as f:
+        f.write(json.dumps(entry) + "\n")
+
+    # Baseline
+    baseline_filepath = os.path.join(config.BENCH_PATH, "baseline.json")
+    if set_baseline:
+        with open(baseline_filepath, "w") as f:
+            json.dump(entry, f, indent=1)
+        print(f"\n{HEADER}Baseline set: <{baseline_filepath}>{ENDC}")
+        return 0
+    try:
+        with open(baseline_filepath, "r") as f:
+            baseline = json.load(f)
+    except OSError:
+        print(f"\n{HEADER}No baseline, set it with --bench --set-baseline{ENDC}")
+        return 0
+    if baseline.get("version") != VERSION:
+        print(f"\n{FAIL}Baseline format version changed, set it again{ENDC}")
+        return 1
+    lines = compare(baseline, entry)
+    print(f"\n{HEADER}Bench against baseline of {baseline['date']}:{ENDC}")
+    if lines:
+        print(f"{FAIL}" + "\n".join(lines) + f"{ENDC}")
+        return 1
+    print(f"{OKGREEN}No regressions{ENDC}")
+    return 0
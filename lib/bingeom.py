@@ -0,0 +1,82 @@
+"""!
+Read and compare FDS .bingeom geometry files, memory mapped by NumPy.
+"""
+
+import filecmp
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is shipped with Blender
+    np = None
+
+
+class BinGeom:
+    """!
+    FDS .bingeom file, a sequence of Fortran unformatted records:
+    INTEGER_ONE, (n_verts, n_faces, n_surf_id, n_volus),
+    verts (float64), faces (int32), surfs (int32), volus (int32).
+    Arrays are views of the memory mapped file, not copies.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.mm = mm = np.memmap(filepath, dtype=np.uint8, mode="r")
+        records, offset = list(), 0
+        while offset + 4 <= mm.size:
+            size = int(np.frombuffer(mm, np.int32, 1, offset)[0])
+            end = offset + 4 + size
+            if size < 0 or end + 4 > mm.size:
+                raise ValueError(f"Bad record at byte {offset}")
+            records.append(mm[offset + 4 : end])
+            offset = end + 4
+        if offset != mm.size or len(records) != 6:
+            raise ValueError(f"Bad .bingeom file: <{filepath}>")
+        self.n_verts, self.n_faces, self.n_surf_id, self.n_volus = (
+            int(n) for n in records[1].view(np.int32)
+        )
+        self.verts = records[2].view(np.float64).reshape(-1, 3)
+        self.faces = records[3].view(np.int32).reshape(-1, 3)
+        self.surfs = records[4].view(np.int32)
+        self.volus = records[5].view(np.int32).reshape(-1, 4)
+
+
+def is_available() -> bool:
+    return np is not None
+
+
+def compare(ref_filepath, filepath, atol=1e-6, rtol=1e-6) -> str:
+    """!
+    Compare two .bingeom files, topology exactly and vertices with tolerances.
+    Return the log of differences, or an empty string if they match.
+    """
+    try:
+        g0, g1 = BinGeom(ref_filepath), BinGeom(filepath)
+    except ValueError as err:
+        if filecmp.cmp(ref_filepath, filepath, shallow=False):
+            return str()  # the same, even if not parsed, eg. a newer format
+        return f"Unreadable .bingeom file: {err}"
+    if g0.mm.size == g1.mm.size and np.array_equal(g0.mm, g1.mm):
+        return str()
+    # Topology
+    log = list()
+    for name in ("n_verts", "n_faces", "n_surf_id", "n_volus"):
+        v0, v1 = getattr(g0, name), getattr(g1, name)
+        if v0 != v1:
+            log.append(f"Topology changed: {name} {v0} -> {v1}")
+    if log:
+        return "\n".join(log)
+    for name in ("faces", "surfs", "volus"):
+        n = np.count_nonzero(getattr(g0, name) != getattr(g1, name))
+        if n:
+            log.append(f"Topology changed: {n} different {name} indexes")
+    # Vertices
+    close = np.isclose(g0.verts, g1.verts, rtol=rtol, atol=atol).all(axis=1)
+    n = close.size - np.count_nonzero(close)
+    if n:
+        dev = np.abs(g0.verts - g1.verts).max()
+        i = int(np.argmin(close))
+        log.append(
+            f"{n} of {close.size} verts differ (atol={atol}, rtol={rtol}), "
+            f"max deviation: {dev:.6g}, first: #{i} {g0.verts[i]} -> {g1.verts[i]}"
+        )
+    return "\n".join(log)
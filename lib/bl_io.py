@@ -1,13 +1,31 @@
-import os, bpy, tempfile, shutil
-from . import compare, run_command
+import os, bpy, tempfile, hashlib, contextlib
+from concurrent.futures import Future, wait
+from . import config, compare, run_command, timing, bl_reset, refstore
+from .cases import case, case_key, walk_tree
 from .testing import TestFail, TestOk, TestException
 
 # Common
 
 
+def _get_results(items) -> list:
+    """!
+    Get the results of items, waiting for the futures of compare results.
+    """
+    results = list()
+    with timing.phase("compare_wait"):
+        for item in items:
+            if isinstance(item, Future):
+                results.extend(item.result())
+            else:
+                results.append(item)
+    return results
+
+
 def open_blend_file(filepath=None):
     if filepath:
         bpy.ops.wm.open_mainfile(filepath=filepath)
+    elif config.FAST_RESET:
+        bl_reset.reset()
     else:
         bpy.ops.wm.read_homefile()
 
@@ -32,26 +50,20 @@ def fds_tree_to_blend(
     Import all fds files from dir tree to Blender.
     """
     results = list()
-    for p, dirs, files in os.walk(path):
-        if exclude_dirs:
-            dirs[:] = [d for d in dirs if d not in exclude_dirs]
-        for filename in files:
-            if filename.endswith(".fds"):
-                if exclude_files and filename in exclude_files:
-                    continue
-                filepath = os.path.join(p, filename)
-                results.extend(
-                    fds_case_to_blend(
-                        package=package,
-                        filepath=filepath,
-                        ref_path=ref_path,
-                        run_fds=run_fds,
-                        set_ref=set_ref,
-                    )
-                )
+    for filepath in walk_tree(package, path, ".fds", exclude_dirs, exclude_files):
+        results.extend(
+            fds_case_to_blend(
+                package=package,
+                filepath=filepath,
+                ref_path=ref_path,
+                run_fds=run_fds,
+                set_ref=set_ref,
+            )
+        )
     return results
 
 
+@case
 def fds_case_to_blend(
     package,
     filepath,
@@ -65,7 +77,8 @@ def fds_case_to_blend(
     results = list()
     print(f"fds_case_to_blend: {filepath}")
     # New blend file with one new scene only
-    open_blend_file(filepath=None)  # new file
+    with timing.phase("open_blend_file"):
+        open_blend_file(filepath=None)  # new file
     old_scs = bpy.data.scenes[:]  # get existing scenes
     sc = bpy.data.scenes.new("scene_tmp")  # get new scene
     if not keep_default:
@@ -77,7 +90,8 @@ def fds_case_to_blend(
     # fds case to Scene
     name = f"Scene from_fds: <{sc.name}> <{filepath}>"
     try:
-        sc.from_fds(context, filepath=filepath)
+        with timing.phase("from_fds"):
+            sc.from_fds(context, filepath=filepath)
     except Exception as err:
         if expected_msg:
             if expected_msg == str(err):
@@ -93,12 +107,29 @@ def fds_case_to_blend(
             return results
     results.append(TestOk(package, name))
 
-    # New tmp blend to fds
+    # Scene to fds case, straight from the imported scene,
+    # or through a saved and reopened tmp blend file as persistence check
     with tempfile.TemporaryDirectory() as tmppath:
+        bl_filepath = os.path.join(tmppath, sc.name + ".blend")  # /tmp/scene.blend
+
+        if not is_persistence_checked(package, filepath):
+            results.extend(
+                scenes_to_fds(
+                    package=package,
+                    filepath=bl_filepath,
+                    scenes=bpy.data.scenes[:],
+                    expected_msg=to_fds_expected_msg,
+                    ref_path=ref_path,
+                    run_fds=run_fds,
+                    set_ref=set_ref,
+                    workspace=tmppath,
+                )
+            )
+            return results
 
         # Save tmp blend file to set bpy.data.filepath
-        bl_filepath = os.path.join(tmppath, sc.name + ".blend")  # /tmp/scene.blend
-        bpy.ops.wm.save_as_mainfile(filepath=bl_filepath)
+        with timing.phase("save_as_mainfile"):
+            bpy.ops.wm.save_as_mainfile(filepath=bl_filepath)
 
         results.extend(
             blend_to_fds(
@@ -114,6 +145,35 @@ def fds_case_to_blend(
     return results
 
 
+def is_persistence_checked(package, filepath) -> bool:
+    """!
+    Check if the case is in the stable sample of the persistence check,
+    whose round trip saves and reopens the blend file.
+    """
+    if not config.FAST_ROUND_TRIP:
+        return True
+    h = int(hashlib.sha1(case_key(package, filepath).encode()).hexdigest(), 16)
+    return h % 1000 < config.PERSISTENCE_CHECK * 1000
+
+
+@contextlib.contextmanager
+def _workspace(path=None):
+    """!
+    Resolve bpy.data.filepath dependent paths of an unsaved blend file to path.
+    The working dir is changed for the whole process, so paths used by threads,
+    eg. of the cache, are absolute.
+    """
+    if not path:
+        yield
+        return
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(cwd)
+
+
 # Blender to FDS
 
 
@@ -133,26 +193,19 @@ def blend_tree_to_fds(
     Export all blend files from dir tree to fds.
     """
     results = list()
-    for p, dirs, files in os.walk(path):
-        if exclude_dirs:
-            dirs[:] = [d for d in dirs if d not in exclude_dirs]
-        for filename in files:
-            if filename.endswith(".blend"):
-                if exclude_files and filename in exclude_files:
-                    continue
-                filepath = os.path.join(p, filename)
-                results.extend(
-                    blend_to_fds(
-                        package=package,
-                        filepath=filepath,
-                        script=script,
-                        script_expected_msg=script_expected_msg,
-                        expected_msg=expected_msg,
-                        ref_path=ref_path,
-                        run_fds=run_fds,
-                        set_ref=set_ref,
-                    )
-                )
+    for filepath in walk_tree(package, path, ".blend", exclude_dirs, exclude_files):
+        results.extend(
+            blend_to_fds(
+                package=package,
+                filepath=filepath,
+                script=script,
+                script_expected_msg=script_expected_msg,
+                expected_msg=expected_msg,
+                ref_path=ref_path,
+                run_fds=run_fds,
+                set_ref=set_ref,
+            )
+        )
     return results
 
 
@@ -160,7 +213,8 @@ def _exec_script(package, sc, script, expected_msg):
     results = list()
     name = f"Script on Scene: <{sc.name}>"
     try:
-        exec(script)
+        with timing.phase("script"):
+            exec(script)
     except Exception as err:
         if expected_msg:
             if expected_msg == str(err):
@@ -178,6 +232,7 @@ def _exec_script(package, sc, script, expected_msg):
     return results
 
 
+@case
 def blend_to_fds(
     package,
     filepath,
@@ -188,15 +243,48 @@ def blend_to_fds(
     run_fds=False,
     set_ref=False,
 ):
-    results = list()
     print(f"blend_to_fds: {filepath}")
 
     # Open blend file
-    open_blend_file(filepath=filepath)
+    with timing.phase("open_blend_file"):
+        open_blend_file(filepath=filepath)
+
+    return scenes_to_fds(
+        package=package,
+        filepath=filepath,
+        scenes=bpy.data.scenes[:],
+        script=script,
+        script_expected_msg=script_expected_msg,
+        expected_msg=expected_msg,
+        ref_path=ref_path,
+        run_fds=run_fds,
+        set_ref=set_ref,
+    )
+
+
+def scenes_to_fds(
+    package,
+    filepath,
+    scenes,
+    script=None,
+    script_expected_msg=None,
+    expected_msg=None,
+    ref_path=None,
+    run_fds=False,
+    set_ref=False,
+    workspace=None,
+):
+    """!
+    Export scenes of the blend filepath to fds, compare with refs and run fds.
+    The blend file may be unsaved, with its bpy.data.filepath dependent paths
+    resolved to workspace.
+    """
+    results = list()  # and futures of compare results, in order
     context = bpy.context
 
-    for sc in bpy.data.scenes:
-        with tempfile.TemporaryDirectory() as tmppath:
+    with contextlib.ExitStack() as tmppaths:  # kept until compared
+        for sc in scenes:
+            tmppath = tmppaths.enter_context(tempfile.TemporaryDirectory())
 
             # Execute script
             if script:
@@ -215,7 +303,8 @@ def blend_to_fds(
             name = f"Scene to_fds: <{sc.name}> <{fds_filepath}>"
             try:
                 sc.bf_config_directory = fds_path
-                sc.to_fds(context=context, full=True, save=True)
+                with _workspace(workspace), timing.phase("to_fds"):
+                    sc.to_fds(context=context, full=True, save=True)
             except Exception as err:
                 if expected_msg:
                     if expected_msg == str(err):
@@ -228,13 +317,13 @@ def blend_to_fds(
                     results.append(
                         TestFail(package, name, f"Unexpected err: <{str(err)}>")
                     )
-                return results
+                return _get_results(results)
             else:
                 if expected_msg:
                     results.append(
                         TestFail(package, name, f"Missed error: <{expected_msg}>")
                     )
-                    return results
+                    return _get_results(results)
             results.append(TestOk(package, name))
 
             # Compare with /ref/filename.blend/scene/
@@ -242,20 +331,20 @@ def blend_to_fds(
                 ref_sc_path = os.path.join(
                     ref_path, os.path.basename(filepath), sc.name
                 )
-                results.extend(
-                    compare.compare_paths(
+                with timing.phase("compare_paths"):
+                    futures = compare.submit_paths(
                         package=package,
                         ref_path=ref_sc_path,
                         path=fds_path,
                     )
-                )
+                results.extend(futures)
 
                 # If requested, copy over /ref/filename.blend/scene/
                 if set_ref:
                     print(f"Setting ref: {ref_sc_path}")
-                    if os.path.exists(path=ref_sc_path):
-                        shutil.rmtree(path=ref_sc_path)
-                    shutil.copytree(src=fds_path, dst=ref_sc_path)
+                    with timing.phase("set_ref"):
+                        wait(futures)  # compared with the old ref
+                        refstore.set_ref(ref_path=ref_sc_path, path=fds_path)
 
             # Run fds on result
             if run_fds:
@@ -265,8 +354,9 @@ def blend_to_fds(
                         filepath=fds_filepath,
                         command="fds",
                         success="STOP:",
-                        timeout=120,
+                        timeout=config.FDS_TIMEOUT,
+                        copy=True,  # tmppath is removed
                     )
                 )
 
-    return results
+        return _get_results(results)
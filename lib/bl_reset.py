@@ -0,0 +1,133 @@
+"""!
+Fast reset of Blender data between cases, back to a template state prepared once
+from the home file, instead of reading the home file each time.
+"""
+
+import atexit, os, shutil, tempfile, bpy
+
+## bpy.data collections restored from the template scenes, their datablocks are removed.
+## Of the other collections, the datablocks missing from the template are removed.
+COLLECTIONS = (
+    "scenes",
+    "objects",
+    "collections",
+    "meshes",
+    "curves",
+    "materials",
+    "textures",
+    "images",
+    "node_groups",
+    "worlds",
+    "cameras",
+    "lights",
+    "texts",
+)
+
+## bpy.data collections of the UI, kept by the reset
+UI_COLLECTIONS = ("window_managers", "screens", "workspaces")
+
+_template = None  # state of a fresh home file
+_template_filepath = None  # library of the template scenes and their data
+_failed = False  # fast reset failed once, read the home file
+
+
+def get_id_collections() -> list:
+    """!
+    Get the names of all the bpy.data collections of datablocks.
+    """
+    names = list()
+    for prop in bpy.data.bl_rna.properties:
+        t = prop.type == "COLLECTION" and prop.fixed_type
+        while t:
+            if t.identifier == "ID":
+                names.append(prop.identifier)
+                break
+            t = t.base
+    return names
+
+
+def get_state() -> dict:
+    """!
+    Get the state of Blender data: its filepath and the names of the datablocks
+    of all its collections, eg. actions, fonts or libraries.
+    """
+    state = {"filepath": bpy.data.filepath}
+    for name in get_id_collections():
+        state[name] = sorted(d.name for d in getattr(bpy.data, name))
+    return state
+
+
+def prepare():
+    """!
+    Read the home file, and save its state and scenes as template.
+    """
+    global _template, _template_filepath, _failed
+    bpy.ops.wm.read_homefile()
+    if _failed:
+        return
+    try:
+        _template = get_state()
+        if _template_filepath is None:
+            path = tempfile.mkdtemp(prefix="bfds_reset_")
+            atexit.register(shutil.rmtree, path, ignore_errors=True)
+            _template_filepath = os.path.join(path, "template.blend")
+            bpy.data.libraries.write(_template_filepath, set(bpy.data.scenes))
+    except Exception as err:  # eg. old Blender api
+        print(f"Fast reset unavailable, reading the home file: {err}")
+        _failed = True
+
+
+def _reset():
+    windows = bpy.context.window_manager.windows
+    keep = bpy.data.scenes[0]  # Blender needs a scene
+    keep.name = "bfds_reset_tmp"
+    for window in windows:
+        window.scene = keep
+    removed = list()
+    for name in get_id_collections():
+        if name in UI_COLLECTIONS:
+            continue
+        kept = name not in COLLECTIONS and set(_template.get(name, ())) or set()
+        removed.extend(
+            d for d in getattr(bpy.data, name) if d != keep and d.name not in kept
+        )
+    bpy.data.batch_remove(removed)
+    with bpy.data.libraries.load(_template_filepath) as (data_from, data_to):
+        data_to.scenes = data_from.scenes
+    for window in windows:
+        window.scene = data_to.scenes[0]
+    bpy.data.scenes.remove(keep, do_unlink=True)
+    bpy.data.batch_remove(  # added by the load
+        [l for l in bpy.data.libraries if l.name not in _template.get("libraries", ())]
+    )
+    if hasattr(bpy.data, "orphans_purge"):  # Blender 3.0+
+        bpy.data.orphans_purge(do_recursive=True)
+
+
+def reset() -> bool:
+    """!
+    Reset Blender data to the template state, by removing the datablocks
+    and appending the template scenes.
+    After a blend file is opened, or if the reset state does not match
+    the template, read the home file instead.
+    Return True if reset fast.
+    """
+    global _failed
+    if _template is None or _failed or bpy.data.filepath:
+        prepare()
+        return False
+    try:
+        _reset()
+    except Exception as err:  # eg. old Blender api
+        print(f"Fast reset failed, reading the home file: {err}")
+        _failed = True
+        prepare()
+        return False
+    state = get_state()
+    if state != _template:
+        diff = [k for k in state if state[k] != _template.get(k)]
+        print(f"Fast reset state differs in {diff}, reading the home file")
+        _failed = True
+        prepare()
+        return False
+    return True
@@ -0,0 +1,146 @@
+"""!
+Persistent result cache of cases, keyed by the hash of everything they depend on.
+"""
+
+import hashlib, json, os, shutil, sys, threading
+from pathlib import Path
+from . import config, testing, cases
+
+_LIB_PATH = os.path.dirname(os.path.abspath(__file__))
+_env_digest = None  # digest of lib, Blender and BlenderFDS, computed once
+_path = os.path.abspath(config.CACHE_PATH)  # the working dir may change, see bl_io
+
+
+def _update_path(h, path):
+    """!
+    Update hash h with the names and contents of the files in path, recursively.
+    """
+    if os.path.isfile(path):
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        return
+    for p, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+        for filename in sorted(files):
+            filepath = os.path.join(p, filename)
+            h.update(os.path.relpath(filepath, path).encode())
+            _update_path(h, filepath)
+
+
+def _get_env_digest() -> str:
+    """!
+    Digest of this library sources, Blender version and BlenderFDS version and sources.
+    """
+    global _env_digest
+    if _env_digest is None:
+        h = hashlib.sha256()
+        _update_path(h, _LIB_PATH)
+        bpy = sys.modules.get("bpy")
+        if bpy:
+            h.update(bpy.app.version_string.encode())
+        bf = sys.modules.get("blenderfds")
+        if bf:
+            h.update(repr(getattr(bf, "bl_info", None)).encode())
+            _update_path(h, os.path.dirname(bf.__file__))
+        _env_digest = h.hexdigest()
+    return _env_digest
+
+
+def _update_command(h, command):
+    """!
+    Update hash h with the path, size and mtime of the command executable,
+    so that installing or upgrading it changes the hash.
+    """
+    filepath = shutil.which(command)
+    h.update(repr(filepath).encode())
+    if filepath:
+        st = os.stat(filepath)
+        h.update(f"{st.st_size} {st.st_mtime_ns}".encode())
+
+
+def get_key(func, arguments):
+    """!
+    Get the cache key of a case function call, or None if not cacheable.
+    """
+    if not config.CACHE or arguments.get("set_ref"):
+        return None
+    h = hashlib.sha256()
+    h.update(_get_env_digest().encode())
+    h.update(f"{func.__module__}.{func.__qualname__}".encode())
+    h.update(repr(sorted(arguments.items())).encode())
+    h.update(repr([getattr(config, name) for name in config.CACHE_CONFIG]).encode())
+    inputs = cases.get_case_inputs(arguments["filepath"])
+    for filepath in inputs:  # the case file, then the files it can load
+        h.update(os.path.relpath(filepath, os.path.dirname(inputs[0])).encode())
+        _update_path(h, filepath)
+    if arguments.get("run_fds"):
+        _update_command(h, "fds")
+        _update_command(h, config.MPIEXEC)
+    module = sys.modules.get(arguments["package"])
+    if module and getattr(module, "__file__", None):
+        _update_path(h, module.__file__)  # test script
+    ref_path = arguments.get("ref_path")
+    if ref_path and os.path.exists(ref_path):
+        _update_path(h, cases.get_ref_case_path(ref_path, arguments["filepath"]))
+    return h.hexdigest()
+
+
+def _get_filepath(key) -> str:
+    return os.path.join(_path, key[:2], key + ".json")
+
+
+def load(key):
+    """!
+    Load and replay the cached results of key, or return None.
+    """
+    filepath = _get_filepath(key)
+    try:
+        with open(filepath, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    os.utime(filepath)  # recently used
+    print(f"Cached results: <{filepath}>")
+    return [testing.result_from_dict(d) for d in data["results"]]
+
+
+def store(key, results):
+    """!
+    Store the results of key, then evict the least recently used entries.
+    """
+    filepath = _get_filepath(key)
+    Path(filepath).parent.mkdir(parents=True, exist_ok=True)
+    tmp_filepath = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_filepath, "w") as f:
+        json.dump({"results": [r.to_dict(inline_log=True) for r in results]}, f)
+    os.replace(tmp_filepath, filepath)  # atomic, for concurrent workers and threads
+    evict()
+
+
+def evict(max_size=None):
+    """!
+    Remove the least recently used entries, until the cache is smaller than max_size.
+    """
+    if max_size is None:
+        max_size = config.CACHE_MAX_SIZE
+    entries, size = list(), 0
+    for p, _, files in os.walk(_path):
+        for filename in files:
+            filepath = os.path.join(p, filename)
+            try:
+                st = os.stat(filepath)
+            except OSError:  # removed by another worker
+                continue
+            entries.append((st.st_mtime, st.st_size, filepath))
+            size += st.st_size
+    if size <= max_size:
+        return
+    for _, entry_size, filepath in sorted(entries):
+        try:
+            os.remove(filepath)
+        except OSError:
+            pass
+        size -= entry_size
+        if size <= max_size:
+            break
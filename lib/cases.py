@@ -0,0 +1,277 @@
+"""!
+Case bookkeeping for the tree walkers: collect, select and identify single cases.
+"""
+
+import os, contextlib, functools, inspect, threading
+from . import config, cache, timing, memory, testing, watchdog
+
+## Root of this repository, case keys are relative to it
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+## Extensions of the case files, the other files in their dirs are their inputs
+CASE_EXTENSIONS = (".fds", ".blend")
+
+_collected = None  # dict of collected case keys and their deps, when collecting
+_selected = None  # set of selected case keys, None for all
+_failed = False  # a selected case failed, the next are skipped if config.FAIL_FAST
+_order = None  # sort key of the case keys in a tree, None for walk order
+_current = None  # key of the running case
+_futures = None  # futures deferred by the running case
+_deferred = list()  # futures of deferred results, in order
+_on_results = None  # called with the results of each case, when reporting
+
+
+def case_key(package, filepath) -> str:
+    """!
+    Return a stable case key, independent from the current working dir.
+    """
+    relpath = os.path.relpath(os.path.abspath(filepath), ROOT_PATH)
+    return f"{package}:{relpath.replace(os.sep, '/')}"
+
+
+def get_case_inputs(filepath) -> list:
+    """!
+    Get the input files of a case: its file, then the other files of its dir tree
+    that it can load, eg. geom/Cube.bingeom or CATF templates.
+    Other cases, the dirs of other cases and reference dirs are excluded.
+    """
+    path = os.path.dirname(os.path.abspath(filepath))
+    filepaths = [os.path.abspath(filepath)]
+    for p, dirs, files in os.walk(path):
+        if p != path and any(f.endswith(CASE_EXTENSIONS) for f in files):
+            dirs[:] = list()  # dir of other cases
+            continue
+        dirs[:] = sorted(
+            d for d in dirs if d != "__pycache__" and not d.endswith("_ref")
+        )
+        for filename in sorted(files):
+            if not filename.endswith(CASE_EXTENSIONS + (".py", ".pyc")):
+                filepaths.append(os.path.join(p, filename))
+    return filepaths
+
+
+def get_ref_case_path(ref_path, filepath) -> str:
+    """!
+    Get the reference dir of a case, eg. ref/filename.blend/ or ref/ for unknown.
+    """
+    for name in (
+        os.path.basename(filepath),
+        os.path.splitext(os.path.basename(filepath))[0] + ".blend",
+    ):
+        path = os.path.join(ref_path, name)
+        if os.path.isdir(path):
+            return path
+    return ref_path
+
+
+def get_case_deps(arguments) -> list:
+    """!
+    Get the paths a case reads: its input files, see get_case_inputs(),
+    and its reference dir.
+    """
+    deps = get_case_inputs(arguments["filepath"])
+    if arguments.get("ref_path"):
+        deps.append(
+            os.path.abspath(
+                get_ref_case_path(arguments["ref_path"], arguments["filepath"])
+            )
+        )
+    return deps
+
+
+def get_current():
+    """!
+    Return the key of the running case, or None.
+    """
+    return _current
+
+
+def case_package(key) -> str:
+    """!
+    Return the package of a case key.
+    """
+    return key.split(":", 1)[0]
+
+
+@contextlib.contextmanager
+def collecting():
+    """!
+    Collect case keys and their deps instead of running the cases.
+    """
+    global _collected
+    _collected = dict()
+    try:
+        yield _collected
+    finally:
+        _collected = None
+
+
+@contextlib.contextmanager
+def selecting(keys=None):
+    """!
+    Run only the cases whose key is in keys, or all cases if keys is None.
+    With config.FAIL_FAST, only until the first failure.
+    """
+    global _selected, _failed
+    _selected, _failed = None if keys is None else set(keys), False
+    try:
+        yield
+    finally:
+        _selected = None
+
+
+@contextlib.contextmanager
+def ordering(order=None):
+    """!
+    Run the cases of a tree sorted by order of their keys, or in walk order if None.
+    """
+    global _order
+    _order = order
+    try:
+        yield
+    finally:
+        _order = None
+
+
+def walk_tree(package, path, extension, exclude_dirs=None, exclude_files=None):
+    """!
+    Get the filepaths of the cases in dir tree, in the order set by ordering().
+    """
+    filepaths = list()
+    for p, dirs, files in os.walk(path):
+        if exclude_dirs:
+            dirs[:] = [d for d in dirs if d not in exclude_dirs]
+        for filename in files:
+            if filename.endswith(extension):
+                if exclude_files and filename in exclude_files:
+                    continue
+                filepaths.append(os.path.join(p, filename))
+    if _order:
+        filepaths.sort(key=lambda f: _order(case_key(package, f)))
+    return filepaths
+
+
+@contextlib.contextmanager
+def reporting(on_results=None):
+    """!
+    Send the results of each case to on_results, as soon as it ends.
+    """
+    global _on_results
+    _on_results = on_results
+    try:
+        yield
+    finally:
+        _on_results = None
+
+
+def defer(future):
+    """!
+    Defer some results of the running case to a future, returning a list of results.
+    """
+    _deferred.append(future)
+    if _futures is not None:
+        _futures.append(future)
+
+
+def take_deferred() -> list:
+    """!
+    Take the futures of the deferred results, in order, without waiting for them.
+    """
+    futures = list(_deferred)
+    _deferred.clear()
+    return futures
+
+
+def drain() -> list:
+    """!
+    Wait for the deferred results, and return them in order.
+    """
+    return [r for future in take_deferred() for r in future.result()]
+
+
+def _store(cache_key, results, futures):
+    """!
+    Cache the case results, as soon as its deferred results are done,
+    unless a failure is caused by the environment, see testing.TestEnvFail.
+    """
+
+    def store(rs):
+        if not any(isinstance(r, testing.TestEnvFail) for r in rs):
+            cache.store(cache_key, rs)
+
+    if not futures:
+        store(results)
+        return
+    lock, pending = threading.Lock(), [len(futures)]
+
+    def done(_):
+        with lock:
+            pending[0] -= 1
+            if pending[0]:
+                return
+        if not any(f.exception() for f in futures):
+            store(results + [r for f in futures for r in f.result()])
+
+    for future in futures:
+        future.add_done_callback(done)
+
+
+def case(func):
+    """!
+    Decorate a function running a single case, identified by its package and filepath.
+    Nested case calls (eg. blend_to_fds from fds_case_to_blend) belong to the outer case.
+    Its phase timings are attached to its first result.
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        global _current, _futures, _failed
+        if _current:
+            return func(*args, **kwargs)
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = bound.arguments
+        key = case_key(arguments["package"], arguments["filepath"])
+        if _collected is not None:
+            _collected[key] = get_case_deps(arguments)
+            return list()
+        if _selected is not None and key not in _selected:
+            return list()
+        if _failed and config.FAIL_FAST:
+            return list()
+        _current, _futures = key, list()
+        try:
+            with timing.recording() as timings:
+                with timing.phase("cache"):
+                    cache_key = cache.get_key(func, arguments)
+                    results = cache_key and cache.load(cache_key)
+                cached = results is not None
+                expired = list()
+                if not cached:
+                    if config.MEMORY:
+                        memory.begin()
+                    results = None  # if interrupted
+                    package = arguments["package"]
+                    with watchdog.watching(package, key, timings) as expired:
+                        results = func(*args, **kwargs)
+                    if expired:
+                        results = list(results or ()) + expired
+            for r in results:
+                r.case = key
+                if cached:
+                    r.timings = list()  # of the cached run
+            if results:
+                results[0].timings = timings
+            if cache_key and not cached and not expired:
+                _store(cache_key, list(results), _futures)
+            if config.MEMORY and not cached:  # not cached, its growth is of this run
+                results = list(results) + memory.check(arguments["package"], key)
+            _failed |= any(not isinstance(r, testing.TestOk) for r in results)
+            if _on_results:
+                _on_results(results)
+            return results
+        finally:
+            _current, _futures = None, None
+
+    return wrapper
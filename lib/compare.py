@@ -1,80 +1,150 @@
-import os, difflib, filecmp
-from pathlib import Path
+import os, filecmp, traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from . import config, diff, bingeom, namelist, refstore
 from .testing import TestFail, TestOk
 
+_executor = None  # pool of compare threads, created when first used
+
+
+def _read_txt_lines(filepath) -> list:
+    """!
+    Read the lines of a text file, header lines excluded
+    """
+    with open(filepath, "r") as f:
+        return [l for l in f.read().splitlines() if not l.startswith("!")]
+
 
 def _diff_txt_file(ref_filepath, txt_filepath) -> str:
     """!
     Diff two text files, header excluded
     """
-    with open(ref_filepath, "r") as f0, open(txt_filepath, "r") as f1:
-        ref_lines = f0.read().splitlines()
-        txt_lines = f1.read().splitlines()
-    log = list()
-    for l in difflib.Differ().compare(ref_lines, txt_lines):
-        if (
-            l.startswith("?")
-            or l.startswith(" ")
-            or l.startswith("- !")
-            or l.startswith("+ !")
+    return "\n".join(
+        diff.diff_lines(
+            _read_txt_lines(ref_filepath),
+            _read_txt_lines(txt_filepath),
+            max_edits=config.DIFF_MAX_EDITS,
+            max_lines=config.DIFF_MAX_LINES,
+        )
+    )
+
+
+def _compare_file(package, ref_filepath, filepath, mode, manifest):
+    """!
+    Compare a file with its reference: by hash first, if in the manifest,
+    then by content, for the log of the differences.
+    """
+    name = f"Compare content: <{ref_filepath}>"
+    try:
+        if manifest and refstore.is_same(
+            ref_filepath, refstore.get_entry(filepath), manifest
         ):
-            continue
-        log.append(l)
-    return "\n".join(log)
+            return list()
+        if filepath.endswith(".bingeom") and bingeom.is_available():
+            log = bingeom.compare(
+                ref_filepath,
+                filepath,
+                atol=config.BINGEOM_ATOL,
+                rtol=config.BINGEOM_RTOL,
+            )
+            return log and [TestFail(package, name, log)] or list()
+        if not manifest and filecmp.cmp(ref_filepath, filepath, shallow=False):
+            return list()  # otherwise different, by their hashes
+        if filepath.endswith(".fds") and mode == "namelist":
+            log = namelist.compare(
+                ref_filepath,
+                filepath,
+                atol=config.NAMELIST_ATOL,
+                rtol=config.NAMELIST_RTOL,
+            )
+        elif filepath.endswith(".fds") or filepath.endswith(".ge1"):
+            log = _diff_txt_file(ref_filepath, filepath)
+        else:
+            log = f"Different file: <{ref_filepath}>"
+    except Exception:
+        log = traceback.format_exc()
+    if log:
+        return [TestFail(package, name, log)]
+    return [TestOk(package, name)]
 
 
-def compare_paths(package, ref_path, path) -> list:
+def _submit(func, *args) -> Future:
     """!
-    Compare two paths recursively.
+    Submit func to the compare threads, or run it now if config.COMPARE_WORKERS is 0.
     """
-    results = list()
+    global _executor
+    if not config.COMPARE_WORKERS:
+        return _done(func(*args))
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=config.COMPARE_WORKERS, thread_name_prefix="compare"
+        )
+    return _executor.submit(func, *args)
 
-    # If not ref_path exists, create
-    Path(ref_path).mkdir(parents=True, exist_ok=True)
 
-    # Check same files
+def _done(results) -> Future:
+    future = Future()
+    future.set_result(results)
+    return future
+
+
+def submit_paths(package, ref_path, path, mode=None) -> list:
+    """!
+    Compare two paths recursively, the files concurrently on the compare threads.
+    Fds files are compared by mode: "text" lines or "namelist" records,
+    config.COMPARE_MODE if None.
+    Files are compared by content only if their hashes differ from the reference
+    manifest, each file is read once to hash it.
+    Return the futures of the results, in order.
+    """
+    mode = mode or config.COMPARE_MODE
+
+    # Check ref_path exists
     name = f"Compare files: <{ref_path}>"
-    ok = True
-    cmp = filecmp.dircmp(ref_path, path)
+    if not os.path.isdir(ref_path):
+        log = f"Missing reference dir: <{ref_path}>"
+        return [_done([TestFail(package, name, log)])]
+
+    # Check same files
+    results = list()
+    cmp = filecmp.dircmp(
+        ref_path, path, ignore=filecmp.DEFAULT_IGNORES + [refstore.MANIFEST]
+    )
     if cmp.left_only:
-        ok = False
         results.append(TestFail(package, name, f"Missing files: {cmp.left_only}"))
     if cmp.right_only:
-        ok = False
         results.append(TestFail(package, name, f"Unexpected files: {cmp.right_only}"))
     if cmp.funny_files:
-        ok = False
         results.append(TestFail(package, name, f"Funny files: {cmp.funny_files}"))
-    if ok:
-        results.append(TestOk(package, name))
-    else:
-        return results
+    if results:
+        return [_done(results)]
+    futures = [_done([TestOk(package, name)])]
 
     # Check file contents
-    (_, mismatch, errors) = filecmp.cmpfiles(
-        ref_path, path, cmp.common_files, shallow=False
-    )
-    mismatch.extend(errors)
-    for f in mismatch:
-        ref_filepath = os.path.join(ref_path, f)
-        filepath = os.path.join(path, f)
-        name = f"Compare content: <{ref_filepath}>"
-        ok = True
-        if f.endswith(".fds") or f.endswith(".ge1"):
-            log = _diff_txt_file(ref_filepath, filepath)
-            if log:
-                ok = False
-                results.append(TestFail(package, name, log))
-        else:
-            ok = False
-            results.append(TestFail(package, name, f"Different file: <{ref_filepath}>"))
-        if ok:
-            results.append(TestOk(package, name))
+    manifest = refstore.get_manifest(ref_path)
+    for f in cmp.common_files:
+        futures.append(
+            _submit(
+                _compare_file,
+                package,
+                os.path.join(ref_path, f),
+                os.path.join(path, f),
+                mode,
+                manifest,
+            )
+        )
 
     # Recurse
     for d in cmp.common_dirs:
         new_ref_path = os.path.join(ref_path, d)
         new_path = os.path.join(path, d)
-        results.extend(compare_paths(package, new_ref_path, new_path))
+        futures.extend(submit_paths(package, new_ref_path, new_path, mode))
+
+    return futures
 
-    return results
+
+def compare_paths(package, ref_path, path, mode=None) -> list:
+    """!
+    Compare two paths recursively, see submit_paths, and return the results.
+    """
+    futures = submit_paths(package, ref_path, path, mode)
+    return [r for f in futures for r in f.result()]
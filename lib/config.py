@@ -1,6 +1,160 @@
+import getpass, os, tempfile
+
 ## Set reference fds files
 SET_REF = False
 
+## Reset Blender data between cases to a template of the home file, without reading it
+FAST_RESET = True
+
+## Export imported fds cases straight from their scene, without saving and reopening them
+FAST_ROUND_TRIP = True
+
+## Sample of the imported fds cases saved and reopened anyway, as persistence check
+PERSISTENCE_CHECK = 0.1
+
 ## Run FDS, if required
 RUN_FDS = True
 
+## Budget of cpu cores for concurrent FDS runs, None for all cores
+FDS_CORES = None
+
+## Directory of the lock files of the FDS_CORES budget when shared by processes,
+## eg. the pool workers, None for a budget of this process only
+FDS_CORES_DIR = None
+
+## MPI launcher of FDS cases with MPI processes
+MPIEXEC = "mpiexec"
+
+## Timeout in seconds of each FDS run, waiting for cores excluded
+FDS_TIMEOUT = 600
+
+## Output lines of FDS runs matching this regex are fatal, the run is stopped
+FDS_FATAL_PATTERN = r"^\s*ERROR\b"
+
+## Head and tail lines of FDS output kept in the results, the full output is in FDS_LOG_PATH
+FDS_LOG_HEAD = 50
+FDS_LOG_TAIL = 200
+FDS_LOG_PATH = "log/fds"
+
+## Smoke run FDS on a rewritten copy of the case: a few locked time steps, no heavy outputs
+FDS_SMOKE = False
+FDS_SMOKE_TIME = 0.01
+FDS_SMOKE_STEPS = 5
+FDS_SMOKE_DROP = ("SLCF", "BNDF", "ISOF", "PROF")
+
+## Content-addressed store of the reference files, hardlinked into the reference dirs
+REF_STORE_PATH = "refstore"
+
+## Time budget in seconds of each case, 0 for none; over it the case fails and is interrupted.
+## A test module can set its own CASE_TIMEOUT. Keep it under WORKER_TIMEOUT.
+CASE_TIMEOUT = 1800
+
+## A case still running this time in seconds after its timeout has its stacks dumped,
+## and exits its Blender process in supervised runs
+CASE_TIMEOUT_GRACE = 60
+
+## Supervised runs: Blender workers hung over this time in seconds on a work item are replaced
+WORKER_TIMEOUT = 7200
+
+## Supervised runs: journal of the completed work items, to resume an interrupted run
+JOURNAL_PATH = "log/journal.jsonl"
+
+## Unix socket of the persistent Blender server, private to its user
+SERVER_SOCKET = os.path.join(
+    os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir(),
+    f"blenderfds_verification_{getpass.getuser()}.sock",
+)
+
+## Shard (i, n) of the cases run on this CI node, i from 1 to n, None for all
+SHARD = None
+
+## History of past runs, its case durations balance the shards, share it between nodes
+HISTORY_PATH = "history.json"
+
+## Run the cases that failed last first, instead of the longest first
+FAILED_FIRST = False
+
+## Stop the run at the first failure
+FAIL_FAST = False
+
+## Cache case results, replayed when nothing they depend on changed
+CACHE = True
+
+## Settings changing case results, part of their cache key
+CACHE_CONFIG = (
+    "DIFF_MAX_EDITS",
+    "DIFF_MAX_LINES",
+    "BINGEOM_ATOL",
+    "BINGEOM_RTOL",
+    "COMPARE_MODE",
+    "NAMELIST_ATOL",
+    "NAMELIST_RTOL",
+    "FDS_FATAL_PATTERN",
+    "FDS_SMOKE",
+    "FDS_SMOKE_TIME",
+    "FDS_SMOKE_STEPS",
+    "FDS_SMOKE_DROP",
+    "FAST_ROUND_TRIP",
+    "PERSISTENCE_CHECK",
+)
+
+## Cache directory
+CACHE_PATH = "cache"
+
+## Max cache size in bytes, least recently used results are evicted
+CACHE_MAX_SIZE = 256 * 1024 * 1024
+
+## Max edits aligned when diffing text files, over it differences are not aligned
+DIFF_MAX_EDITS = 5000
+
+## Max different lines reported when diffing text files
+DIFF_MAX_LINES = 500
+
+## Absolute and relative tolerances comparing .bingeom vertices
+BINGEOM_ATOL = 1e-6
+BINGEOM_RTOL = 1e-6
+
+## Threads comparing exported files with references while exporting, 0 for none
+COMPARE_WORKERS = 4
+
+## Compare fds files by "text" lines or by "namelist" records
+COMPARE_MODE = "text"
+
+## Absolute and relative tolerances comparing namelist numeric values
+NAMELIST_ATOL = 1e-6
+NAMELIST_RTOL = 1e-6
+
+## Reporters of results: "console", "text" log, "jsonl" and "junit" xml, into log/
+REPORTERS = ("console", "text", "jsonl", "junit")
+
+## Console verbosity: 0 summary only, 1 failures in full, 2 all results in full
+VERBOSITY = 1
+
+## Result logs over this size in chars are kept on disk, in the log store dir
+LOG_SPILL_SIZE = 4096
+LOG_STORE_PATH = "log/store"
+
+## Slowest cases and phases in the timing summary
+TIMING_SUMMARY_QTY = 10
+
+## Bench: warmup and timed runs, results dir with history and baseline
+BENCH_WARMUP = 1
+BENCH_REPEATS = 5
+BENCH_PATH = "bench"
+
+## Bench: regression thresholds, relative, in median absolute deviations, and in seconds
+BENCH_THRESHOLD = 0.2
+BENCH_NOISE = 3.0
+BENCH_MIN_DELTA = 0.005
+
+## Track the memory left by each case, see lib/memory.py
+MEMORY = False
+
+## Memory growth by case over these is reported: RSS and Python bytes,
+## datablocks of each bpy.data collection
+MEMORY_RSS_GROWTH = 64 * 1024 * 1024
+MEMORY_PY_GROWTH = 16 * 1024 * 1024
+MEMORY_DATA_GROWTH = 0
+
+## Top Python allocations reported
+MEMORY_TOP = 10
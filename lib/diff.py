@@ -0,0 +1,129 @@
+"""!
+Line diff for long and similar files, such as exported fds cases.
+Lines unique in both files anchor the alignment (patience diff),
+the gaps between anchors are aligned by the Myers O((N+M)D) algorithm.
+"""
+
+import bisect
+from collections import Counter
+
+
+def _get_myers_matches(a, b, max_d):
+    """!
+    Get the matching (i, j) line pairs of a shortest edit script of a into b,
+    or None if more than max_d edits are needed.
+    """
+    n, m = len(a), len(b)
+    max_d = min(n + m, max_d)
+    off = max_d + 1
+    v = [0] * (2 * max_d + 3)
+    trace = list()  # v slices for k in [-d, d], for each d
+    for d in range(max_d + 1):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[off + k - 1] < v[off + k + 1]):
+                x = v[off + k + 1]  # down, insert b[y]
+            else:
+                x = v[off + k - 1] + 1  # right, delete a[x]
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x, y = x + 1, y + 1
+            v[off + k] = x
+            if x >= n and y >= m:
+                trace.append(v[off - d : off + d + 1])
+                return _backtrack(trace, n, m)
+        trace.append(v[off - d : off + d + 1])
+    return None
+
+
+def _backtrack(trace, x, y):
+    matches = list()
+    for d in range(len(trace) - 1, 0, -1):
+        vp = trace[d - 1]  # vp[k + d - 1] for k in [-d + 1, d - 1]
+        k = x - y
+        if k == -d or (k != d and vp[k - 1 + d - 1] < vp[k + 1 + d - 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = vp[prev_k + d - 1]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x, y = x - 1, y - 1
+            matches.append((x, y))
+        x, y = prev_x, prev_y
+    while x > 0 and y > 0:
+        x, y = x - 1, y - 1
+        matches.append((x, y))
+    matches.reverse()
+    return matches
+
+
+def _get_anchors(a, alo, ahi, b, blo, bhi):
+    """!
+    Get the longest increasing sequence of (i, j) pairs of lines unique in both ranges.
+    """
+    ca, cb = Counter(a[alo:ahi]), Counter(b[blo:bhi])
+    bj = {b[j]: j for j in range(blo, bhi) if cb[b[j]] == 1 and ca[b[j]] == 1}
+    pairs = [(i, bj[a[i]]) for i in range(alo, ahi) if a[i] in bj]
+    # Patience sorting, pairs are sorted by i
+    tails, tails_j, prevs = list(), list(), list()
+    for pair in pairs:
+        pos = bisect.bisect_left(tails_j, pair[1])
+        prevs.append(tails[pos - 1] if pos else None)
+        if pos == len(tails):
+            tails.append(len(prevs) - 1)
+            tails_j.append(pair[1])
+        else:
+            tails[pos] = len(prevs) - 1
+            tails_j[pos] = pair[1]
+    anchors, index = list(), tails[-1] if tails else None
+    while index is not None:
+        anchors.append(pairs[index])
+        index = prevs[index]
+    anchors.reverse()
+    return anchors
+
+
+def _get_matches(a, alo, ahi, b, blo, bhi, max_edits, matches):
+    """!
+    Append to matches the matching (i, j) line pairs of the ranges.
+    """
+    # Common head and tail
+    while alo < ahi and blo < bhi and a[alo] == b[blo]:
+        matches.append((alo, blo))
+        alo, blo = alo + 1, blo + 1
+    tail = list()
+    while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+        ahi, bhi = ahi - 1, bhi - 1
+        tail.append((ahi, bhi))
+    # Anchors, or Myers on the gap
+    if alo < ahi and blo < bhi:
+        anchors = _get_anchors(a, alo, ahi, b, blo, bhi)
+        if anchors:
+            for i, j in anchors:
+                _get_matches(a, alo, i, b, blo, j, max_edits, matches)
+                matches.append((i, j))
+                alo, blo = i + 1, j + 1
+            _get_matches(a, alo, ahi, b, blo, bhi, max_edits, matches)
+        elif not set(a[alo:ahi]).isdisjoint(b[blo:bhi]):
+            ms = _get_myers_matches(a[alo:ahi], b[blo:bhi], max_edits) or ()
+            matches.extend((alo + i, blo + j) for i, j in ms)
+    matches.extend(reversed(tail))
+
+
+def diff_lines(a, b, max_edits=5000, max_lines=None) -> list:
+    """!
+    Diff two lists of lines, and return only the different ones
+    prefixed by "- " or "+ ", as difflib.Differ does.
+    Gaps between anchors needing more than max_edits are not aligned.
+    Over max_lines, the output is truncated and summarized.
+    """
+    matches = list()
+    _get_matches(a, 0, len(a), b, 0, len(b), max_edits, matches)
+    log, i, j = list(), 0, 0
+    for mi, mj in matches + [(len(a), len(b))]:
+        log.extend("- " + l for l in a[i:mi])
+        log.extend("+ " + l for l in b[j:mj])
+        i, j = mi + 1, mj + 1
+    if max_lines is not None and len(log) > max_lines:
+        log = log[:max_lines] + [f"... and {len(log) - max_lines} more different lines"]
+    return log
@@ -0,0 +1,77 @@
+"""!
+History of the cases of past runs: their last durations and outcomes,
+used to balance shards and to order the runs.
+Results without a case are kept by their test module name.
+"""
+
+import json, os
+from collections import defaultdict
+from pathlib import Path
+from . import config, timing, testing
+from .cases import case_package
+
+## Format version of the history file
+VERSION = 1
+
+
+def load() -> dict:
+    """!
+    Load the history, by case key.
+    """
+    try:
+        with open(config.HISTORY_PATH, "r") as f:
+            history = json.load(f)
+    except (OSError, ValueError):
+        return dict()
+    if history.get("version") != VERSION:
+        return dict()
+    return history["cases"]
+
+
+def get_durations() -> dict:
+    """!
+    Get the last wall time of the cases, by case key.
+    """
+    return {k: c["wall"] for k, c in load().items() if c.get("wall") is not None}
+
+
+def get_order(failed_first=False):
+    """!
+    Get the sort key of case keys and module names: longest first,
+    and last failed first if failed_first. Modules sum up their cases.
+    """
+    walls, failed = defaultdict(float), set()
+    for key, c in load().items():
+        for k in {key, case_package(key)}:
+            walls[k] += c.get("wall") or 0.0
+            if c.get("failed"):
+                failed.add(k)
+
+    def order(key):
+        return (failed_first and key not in failed, -walls.get(key, 0.0))
+
+    return order
+
+
+def update(results):
+    """!
+    Update the history with the results of a run.
+    Cached cases keep their previous duration, their run was not timed.
+    Shard runs do not, all shards must read the same history: merge them instead.
+    """
+    if config.SHARD:
+        return
+    cases = load()
+    for key, timings in timing.get_cases(results).items():
+        if any(name != "cache" for name, _, _ in timings):
+            cases.setdefault(key, dict())["wall"] = sum(w for _, w, _ in timings)
+    failed = defaultdict(bool)
+    for r in results:
+        failed[r.case or r.package] |= not isinstance(r, testing.TestOk)
+    for key, f in failed.items():
+        cases.setdefault(key, dict())["failed"] = f
+    Path(config.HISTORY_PATH).parent.mkdir(parents=True, exist_ok=True)
+    tmp_filepath = f"{config.HISTORY_PATH}.{os.getpid()}.tmp"
+    with open(tmp_filepath, "w") as f:
+        json.dump({"version": VERSION, "cases": cases}, f, indent=1, sort_keys=True)
+    os.replace(tmp_filepath, config.HISTORY_PATH)
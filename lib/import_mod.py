@@ -1,4 +1,4 @@
-import importlib, pkgutil
+import ast, importlib, importlib.util, os, pkgutil
 
 
 def import_submodules(package, recursive=True):
@@ -14,3 +14,37 @@ def import_submodules(package, recursive=True):
         if recursive and is_pkg:
             results.update(import_submodules(full_name))
     return results
+
+
+def _get_run_doc(filepath):
+    with open(filepath, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filepath)
+    if not any(
+        isinstance(n, ast.FunctionDef) and n.name == "run" for n in tree.body
+    ):
+        return None
+    doc = (ast.get_docstring(tree) or "").lstrip("!")  # doxygen marker
+    return " ".join(doc.split("\n\n")[0].split())
+
+
+def scan_submodules(package) -> dict:
+    """!
+    Scan the direct submodules of a package that have a run() function,
+    statically by their source code, without importing them nor their imports.
+    Return their names and the first paragraph of their docstrings.
+    """
+    spec = importlib.util.find_spec(package)
+    results = dict()
+    for _, name, is_pkg in pkgutil.iter_modules(spec.submodule_search_locations):
+        for path in spec.submodule_search_locations:
+            filepath = os.path.join(path, name, "__init__.py")
+            if not is_pkg:
+                filepath = os.path.join(path, f"{name}.py")
+            if os.path.isfile(filepath):
+                break
+        else:
+            continue  # eg. compiled
+        doc = _get_run_doc(filepath)
+        if doc is not None:
+            results[".".join((package, name))] = doc
+    return results
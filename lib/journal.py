@@ -0,0 +1,75 @@
+"""!
+Checkpoint journal of the work items completed by a supervised run,
+one json line each, to resume the run after an interruption.
+"""
+
+import json
+from pathlib import Path
+from . import config
+
+_f = None  # journal file, when started
+
+
+def get_key(module, case_keys) -> str:
+    """!
+    Get the journal key of a work item.
+    """
+    return json.dumps([module, case_keys])
+
+
+def load() -> dict:
+    """!
+    Load the completed work items of the journal: key: result dicts.
+    Lines truncated by a crash are ignored.
+    """
+    completed = dict()
+    try:
+        with open(config.JOURNAL_PATH, "r") as f:
+            for line in f:
+                try:
+                    d = json.loads(line)
+                except ValueError:
+                    continue
+                completed[get_key(d["module"], d["cases"])] = d["results"]
+    except OSError:
+        pass
+    return completed
+
+
+def start(resume=False) -> dict:
+    """!
+    Start the journal, resuming the previous one if resume.
+    Return the completed work items to skip, see load().
+    """
+    global _f
+    completed = resume and load() or dict()
+    Path(config.JOURNAL_PATH).parent.mkdir(parents=True, exist_ok=True)
+    _f = open(config.JOURNAL_PATH, resume and "a" or "w")
+    if resume and _f.tell():
+        _f.write("\n")  # after a truncated line
+    return completed
+
+
+def record(module, case_keys, results):
+    """!
+    Record the results of a completed work item, if the journal is started.
+    """
+    if _f is None:
+        return
+    d = {
+        "module": module,
+        "cases": case_keys,
+        "results": [r.to_dict(inline_log=True) for r in results],
+    }
+    _f.write(json.dumps(d) + "\n")
+    _f.flush()  # for crashed runs
+
+
+def finish():
+    """!
+    Close the journal.
+    """
+    global _f
+    if _f is not None:
+        _f.close()
+        _f = None
@@ -0,0 +1,41 @@
+"""!
+Content-addressed store of large result logs on disk, read back only when reported.
+"""
+
+import hashlib, os, threading
+from pathlib import Path
+from . import config
+
+_path = os.path.abspath(config.LOG_STORE_PATH)  # the working dir may change later
+
+
+def get_filepath(digest) -> str:
+    return os.path.join(_path, digest[:2], digest + ".txt")
+
+
+def put(log) -> str:
+    """!
+    Store log, once per content, and return its digest.
+    """
+    data = log.encode("utf-8", "replace")
+    digest = hashlib.sha256(data).hexdigest()
+    filepath = get_filepath(digest)
+    if not os.path.exists(filepath):
+        Path(filepath).parent.mkdir(parents=True, exist_ok=True)
+        tmp_filepath = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_filepath, "wb") as f:
+            f.write(data)
+        os.replace(tmp_filepath, filepath)  # atomic, for concurrent workers and threads
+    return digest
+
+
+def get(digest) -> str:
+    """!
+    Get the log of digest.
+    """
+    filepath = get_filepath(digest)
+    try:
+        with open(filepath, "rb") as f:
+            return f.read().decode("utf-8", "replace")
+    except OSError:
+        return f"Log not found: <{filepath}>"
@@ -0,0 +1,125 @@
+"""!
+Track the memory left by each case in a long Blender session:
+process RSS, Python allocations and the sizes of all bpy.data collections,
+sampled after each case and the usual Blender data reset between cases,
+so that datablocks surviving it are leaks. Written to a timeline.
+"""
+
+import datetime, gc, json, os, sys, tracemalloc
+from pathlib import Path
+from . import config, testing
+
+_last = None  # last sample
+_snapshot = None  # last tracemalloc snapshot
+_timeline_filepath = None
+
+
+def get_rss() -> int:
+    """!
+    Get the resident set size of this process in bytes, or its peak if unavailable.
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource  # unix only
+    except ImportError:
+        return 0
+    r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return sys.platform == "darwin" and r or r * 1024
+
+
+def sample() -> dict:
+    """!
+    Sample the process RSS, the traced Python memory and the bpy.data sizes.
+    """
+    gc.collect()
+    data = dict()
+    if "bpy" in sys.modules:
+        from . import bl_reset
+
+        bpy = sys.modules["bpy"]
+        try:
+            names = bl_reset.get_id_collections()
+        except Exception:  # eg. old Blender api
+            names = bl_reset.COLLECTIONS
+        data = {n: len(getattr(bpy.data, n)) for n in names if hasattr(bpy.data, n)}
+    return {
+        "rss": get_rss(),
+        "py": tracemalloc.get_traced_memory()[0],
+        "data": data,
+    }
+
+
+def _reset():
+    """!
+    Reset Blender data as between cases, see bl_io.open_blend_file(), before sampling.
+    """
+    if "bpy" in sys.modules:
+        from . import bl_io
+
+        bl_io.open_blend_file(None)
+
+
+def begin():
+    """!
+    Start tracking before the first case, sampling the same reset state of the others.
+    """
+    global _last, _snapshot, _timeline_filepath
+    if _last is not None:
+        return
+    _reset()
+    tracemalloc.start()
+    _last, _snapshot = sample(), tracemalloc.take_snapshot()
+    stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M")
+    _timeline_filepath = os.path.join("log", f"memory_{stamp}_{os.getpid()}.jsonl")
+    Path("log").mkdir(parents=True, exist_ok=True)
+    print(f"Memory timeline: <{_timeline_filepath}>")
+
+
+def _get_top_allocations(snapshot) -> list:
+    stats = snapshot.filter_traces(
+        (tracemalloc.Filter(False, tracemalloc.__file__),)
+    ).compare_to(_snapshot, "lineno")
+    return [str(s) for s in stats[: config.MEMORY_TOP] if s.size_diff > 0]
+
+
+def check(package, key) -> list:
+    """!
+    Reset Blender data, sample the memory left by case key and add it to the timeline.
+    Return a failure if its growth is past the thresholds.
+    """
+    global _last, _snapshot
+    _reset()  # what is left is leaked
+    s, snapshot = sample(), tracemalloc.take_snapshot()
+    growth = {
+        "rss": s["rss"] - _last["rss"],
+        "py": s["py"] - _last["py"],
+        "data": {
+            name: n - _last["data"].get(name, 0)
+            for name, n in s["data"].items()
+            if n != _last["data"].get(name, 0)
+        },
+    }
+    with open(_timeline_filepath, "a") as f:
+        f.write(json.dumps({"case": key, **s, "growth": growth}) + "\n")
+    results = list()
+    if (
+        growth["rss"] > config.MEMORY_RSS_GROWTH
+        or growth["py"] > config.MEMORY_PY_GROWTH
+        or any(n > config.MEMORY_DATA_GROWTH for n in growth["data"].values())
+    ):
+        log = "\n".join(
+            (
+                f"RSS growth: {growth['rss'] / 1e6:.1f} MB",
+                f"Python memory growth: {growth['py'] / 1e6:.1f} MB",
+                f"bpy.data growth: {growth['data']}",
+                "Top allocations:",
+                *_get_top_allocations(snapshot),
+            )
+        )
+        results.append(testing.TestFail(package, f"Memory growth: <{key}>", log))
+    _last, _snapshot = s, snapshot
+    return results
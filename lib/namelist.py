@@ -0,0 +1,259 @@
+"""!
+Streaming FDS namelist parser and semantic comparator of fds cases.
+"""
+
+import math, re
+from collections import defaultdict, Counter
+
+## Groups whose record order is significant, besides records sharing the same ID
+ORDERED_GROUPS = ("MESH",)
+
+_TOKEN_RE = re.compile(r"""'[^']*'|"[^"]*"|[A-Za-z_]\w*\([^)]*\)|=|[^\s,'"=]+""")
+_LOGICALS = {"T": True, ".TRUE.": True, "F": False, ".FALSE.": False}
+
+
+class Namelist:
+    """!
+    FDS namelist record, eg. &OBST ID='Box' XB=0,1,0,1,0,1 /
+    """
+
+    __slots__ = ("group", "params", "lineno")
+
+    def __init__(self, group, params, lineno):
+        self.group = group
+        self.params = params  # dict: name: tuple of values
+        self.lineno = lineno
+
+    @property
+    def id(self):
+        value = self.params.get("ID")
+        return value and value[0] or None
+
+    @property
+    def label(self):
+        if self.id is not None:
+            return f"&{self.group} ID='{self.id}'"
+        return f"&{self.group} (line {self.lineno})"
+
+
+def _parse_value(token):
+    if token[0] in "'\"":
+        return token[1:-1]
+    logical = _LOGICALS.get(token.upper())
+    if logical is not None:
+        return logical
+    try:
+        return float(token.replace("D", "E").replace("d", "e"))
+    except ValueError:
+        return token
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return value and "T" or "F"
+    if isinstance(value, str):
+        return "'" in value and f'"{value}"' or f"'{value}'"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))  # eg. IJK
+    return str(value)
+
+
+def _parse_values(token):
+    if "*" in token and token[0] not in "'\"":  # eg. 3*0.
+        n, _, value = token.partition("*")
+        if n.isdigit():
+            return [_parse_value(value)] * int(n)
+    return [_parse_value(token)]
+
+
+def _parse(body, lineno):
+    tokens = _TOKEN_RE.findall(body)
+    if not tokens:
+        return None
+    group, params, name = tokens[0].upper(), dict(), None
+    for i, token in enumerate(tokens[1:], 1):
+        if token == "=":
+            continue
+        if i + 1 < len(tokens) and tokens[i + 1] == "=":
+            name = token.upper().replace(" ", "")
+            params[name] = list()
+        elif name:
+            params[name].extend(_parse_values(token))
+    return Namelist(group, {k: tuple(v) for k, v in params.items()}, lineno)
+
+
+def iter_spans(lines):
+    """!
+    Yield the (first lineno, last lineno, body) of the namelist records in lines.
+    Text outside of namelists, such as the header, is ignored.
+    """
+    body, quote, start = None, None, 0
+    for lineno, line in enumerate(lines, 1):
+        if body is None:
+            stripped = line.lstrip()
+            if not stripped.startswith("&"):
+                continue
+            body, line, start, quote = list(), stripped[1:], lineno, None
+        for i, c in enumerate(line):
+            if quote:
+                if c == quote:
+                    quote = None
+            elif c in "'\"":
+                quote = c
+            elif c == "/":
+                body.append(line[:i])
+                yield start, lineno, " ".join(body)
+                body = None
+                break
+        else:
+            body.append(line)
+
+
+def iter_namelists(filepath):
+    """!
+    Yield the namelist records of an fds file, one at a time.
+    """
+    with open(filepath, "r") as f:
+        for start, _, body in iter_spans(f):
+            namelist = _parse(body, start)
+            if namelist:
+                yield namelist
+
+
+def format_namelist(namelist) -> str:
+    """!
+    Format a namelist record on one line, eg. &TIME T_END=1.0 /
+    """
+    params = " ".join(
+        f"{name}={','.join(_format_value(v) for v in value)}"
+        for name, value in namelist.params.items()
+    )
+    return f"&{namelist.group} {params} /"
+
+
+def _index(filepath):
+    """!
+    Index the namelists of an fds file by group and ID.
+    """
+    by_id = defaultdict(list)  # (group, ID): namelists, in order
+    unnamed = defaultdict(list)  # group: namelists without ID
+    ordered = defaultdict(list)  # group: namelists of ordered groups
+    for n in iter_namelists(filepath):
+        if n.id is None:
+            unnamed[n.group].append(n)
+        else:
+            by_id[(n.group, n.id)].append(n)
+        if n.group in ORDERED_GROUPS:
+            ordered[n.group].append(n)
+    return by_id, unnamed, ordered
+
+
+def _is_close(v0, v1, atol, rtol):
+    if len(v0) != len(v1):
+        return False
+    for a, b in zip(v0, v1):
+        if isinstance(a, float) and isinstance(b, float):
+            if not math.isclose(a, b, rel_tol=rtol, abs_tol=atol):
+                return False
+        elif a != b:
+            return False
+    return True
+
+
+def _format(value):
+    return ",".join(isinstance(v, str) and f"'{v}'" or str(v) for v in value)
+
+
+def _diff_params(n0, n1, atol, rtol):
+    log = list()
+    for name in dict.fromkeys((*n0.params, *n1.params)):
+        v0, v1 = n0.params.get(name), n1.params.get(name)
+        if v0 is None:
+            log.append(f"{n1.label}: {name} added: {_format(v1)}")
+        elif v1 is None:
+            log.append(f"{n0.label}: {name} removed: {_format(v0)}")
+        elif not _is_close(v0, v1, atol, rtol):
+            log.append(f"{n0.label}: {name} changed: {_format(v0)} -> {_format(v1)}")
+    return log
+
+
+def _is_match(n0, n1, atol, rtol):
+    return n0.params.keys() == n1.params.keys() and not _diff_params(n0, n1, atol, rtol)
+
+
+def _signature(n):
+    return n.group, tuple(sorted(n.params.items()))
+
+
+def _get_order(ns0, ns1, atol, rtol):
+    """!
+    Get the positions of the records ns1 among their matching records ns0,
+    or None if some do not match, as their differences are logged apart.
+    """
+    left, order = list(range(len(ns0))), list()
+    for n1 in ns1:
+        for j in left:
+            if _is_match(ns0[j], n1, atol, rtol):
+                left.remove(j)
+                order.append(j)
+                break
+        else:
+            return None
+    return order
+
+
+def compare(ref_filepath, filepath, atol=1e-6, rtol=1e-6) -> str:
+    """!
+    Compare the namelists of two fds files, matched by group and ID,
+    with numeric tolerances. Record order is significant only among records
+    sharing the same ID and in ORDERED_GROUPS.
+    Return the log of differences, or an empty string if they match.
+    """
+    by_id0, unnamed0, ordered0 = _index(ref_filepath)
+    by_id1, unnamed1, ordered1 = _index(filepath)
+    log = list()
+
+    # Records with ID
+    for key in dict.fromkeys((*by_id0, *by_id1)):
+        ns0, ns1 = by_id0.get(key, ()), by_id1.get(key, ())
+        if len(ns0) != len(ns1):
+            label = (ns0 or ns1)[0].label
+            log.append(f"{label}: {len(ns0)} records -> {len(ns1)}")
+        for n0, n1 in zip(ns0, ns1):
+            log.extend(_diff_params(n0, n1, atol, rtol))
+
+    # Records without ID, identical first, then within tolerances
+    for group in dict.fromkeys((*unnamed0, *unnamed1)):
+        ns0, ns1 = unnamed0.get(group, list()), unnamed1.get(group, list())
+        common = Counter(map(_signature, ns0)) & Counter(map(_signature, ns1))
+        left0, left1 = list(), list()
+        for ns, left in ((ns0, left0), (ns1, left1)):
+            c = common.copy()
+            for n in ns:
+                s = _signature(n)
+                if c[s]:
+                    c[s] -= 1
+                else:
+                    left.append(n)
+        for n0 in left0:
+            for n1 in left1:
+                if _is_match(n0, n1, atol, rtol):
+                    left1.remove(n1)
+                    break
+            else:
+                log.append(f"{n0.label}: missing")
+        log.extend(f"{n1.label}: unexpected" for n1 in left1)
+
+    # Order, of records with or without ID
+    for group in dict.fromkeys((*ordered0, *ordered1)):
+        ns0, ns1 = ordered0.get(group, ()), ordered1.get(group, ())
+        if len(ns0) != len(ns1) or all(
+            _is_match(n0, n1, atol, rtol) for n0, n1 in zip(ns0, ns1)
+        ):
+            continue
+        order = _get_order(ns0, ns1, atol, rtol)
+        if order:
+            positions = [j + 1 for j in order]
+            log.append(f"&{group}: order changed, reference records: {positions}")
+
+    return "\n".join(log)
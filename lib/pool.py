@@ -0,0 +1,409 @@
+"""!
+Run tests on a pool of Blender workers, fed by a work queue of modules and cases.
+"""
+
+import itertools, json, os, queue, subprocess, threading
+from pathlib import Path
+from . import config, run_blender, testing, worker, affected, scheduler, reporters
+from . import shard, history, journal, watchdog
+from .testing import TestFail
+from .bcolors import HEADER, ENDC
+
+
+class Worker:
+    """!
+    Worker connection, its output is read by a thread and queued as events.
+    """
+
+    def __init__(self, name, rfile, wfile, events):
+        self.name = name
+        self.item = None  # index of the running item
+        self.timer = None  # of the running item, when it hangs
+        self.killed = False
+        self._wfile = wfile
+        self._log = open(os.path.join("log", f"{name}.txt"), "w")
+        self._log_lock = threading.Lock()
+        threading.Thread(target=self._read, args=(rfile, events), daemon=True).start()
+
+    def _write_log(self, text):
+        with self._log_lock:
+            if not self._log.closed:
+                self._log.write(text)
+                self._log.flush()  # read when crashed
+
+    def _read(self, rfile, events):
+        # Protocol messages go to the events, other output to the worker log
+        for line in rfile:
+            try:
+                msg = worker.receive(line)
+            except ValueError:  # garbled, eg. interleaved with other output
+                self._write_log(f"\nUnreadable protocol line, worker killed: {line}")
+                self.killed = True
+                self.kill()  # as crashed, its messages are lost
+                break
+            if msg is None:
+                if line.strip():
+                    self._write_log(line)
+            else:
+                events.put((self, msg))
+        self.close()
+        with self._log_lock:
+            self._log.close()
+        events.put((self, None))  # exited
+
+    def send(self, msg):
+        try:
+            self._wfile.write(json.dumps(msg) + "\n")
+            self._wfile.flush()
+        except OSError:  # exited, its event follows
+            pass
+
+    def close(self):
+        pass
+
+    def kill(self):
+        pass
+
+
+class _BlenderWorker(Worker):
+    """!
+    Worker in a new background Blender process.
+    On POSIX, its protocol messages have their own pipe, apart from its output,
+    that could interleave with them.
+    """
+
+    def __init__(self, name, command, events):
+        env, pass_fds = None, ()
+        if os.name == "posix":
+            rfd, wfd = os.pipe()
+            env, pass_fds = {**os.environ, worker.FD_ENV: str(wfd)}, (wfd,)
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            env=env,
+            pass_fds=pass_fds,
+        )
+        if not pass_fds:
+            super().__init__(name, self.process.stdout, self.process.stdin, events)
+            self._output = None
+            return
+        os.close(wfd)
+        rfile = os.fdopen(rfd, "r", encoding="utf-8", errors="replace")
+        super().__init__(name, rfile, self.process.stdin, events)
+        self._output = threading.Thread(target=self._copy_output, daemon=True)
+        self._output.start()
+
+    def _copy_output(self):
+        for line in self.process.stdout:
+            self._write_log(line)
+
+    def close(self):
+        self.process.wait()
+        if self._output:
+            self._output.join(timeout=10)  # its last output, eg. a stack dump
+
+    def kill(self):
+        self.process.kill()
+
+
+def get_modules(test_py_module, requested_test_names=None) -> list:
+    """!
+    Get the requested test modules names, without importing them.
+    """
+    modules = list(testing.get_requested(test_py_module, requested_test_names))
+    print(f"{HEADER}Requested tests:{ENDC}")
+    print("  " + "\n  ".join(modules))
+    return modules
+
+
+def _get_items(modules, collected) -> list:
+    """!
+    Split modules into work items, one per collected case or one per module.
+    """
+    items = list()
+    for m in modules:
+        keys = collected.get(m)
+        if keys:
+            items.extend((m, [k]) for k in dict.fromkeys(keys))
+        else:
+            items.append((m, None))
+    return items
+
+
+def _get_fail(item, log) -> list:
+    """!
+    Get the failure of a work item that did not run to its end.
+    """
+    module, keys = item
+    return [TestFail(module, f"Run <{module}> on cases: {keys}", log)]
+
+
+def _get_crash_log(w) -> str:
+    """!
+    Get the failure log of a worker crashed on its item,
+    with the stacks dumped by the watchdog if its case was stuck.
+    """
+    filepath = os.path.join("log", f"{w.name}.txt")
+    try:
+        with open(filepath, "r") as f:
+            dump = watchdog.get_dump(f.read())
+    except OSError:
+        dump = None
+    if dump is None:
+        return f"Worker crashed, see: <{filepath}>"
+    return (
+        f"Case stuck over its time budget, worker exited, see: <{filepath}>\n"
+        f"{dump}"
+    )
+
+
+def _get_pending(items) -> list:
+    """!
+    Get the indexes of the work items, by past durations and outcomes.
+    """
+    order = history.get_order(config.FAILED_FIRST)
+
+    def key(i):
+        module, keys = items[i]
+        return order(keys and keys[0] or module)
+
+    return sorted(range(len(items)), key=key)
+
+
+def dispatch(
+    workers,
+    events,
+    modules,
+    config_overrides=None,
+    affected_base=None,
+    on_results=None,
+    new_worker=None,
+    completed=None,
+) -> list:
+    """!
+    Collect cases on the first ready worker, then dispatch the work items
+    to the ready workers and return their results, in order.
+    The results of each item are sent to on_results as soon as they arrive,
+    and recorded into the journal, if started, when complete:
+    its deferred results, eg. fds runs, follow while the worker runs other items.
+    Workers apply config_overrides to their config module.
+    Only the cases affected by changes since affected_base git ref are run, if set,
+    and only the cases of config.SHARD, if set.
+    Longest cases are dispatched first, or last failed first with config.FAILED_FIRST.
+    With config.FAIL_FAST, no more items are dispatched after the first failure.
+    With new_worker, a worker crashed, stuck on a case (see watchdog),
+    or hung over config.WORKER_TIMEOUT on an item fails the item
+    and is replaced by new_worker(), appended to workers.
+    The items in completed, see journal.load(), are not run again.
+    """
+    config_overrides = config_overrides or dict()
+    completed = completed or dict()
+    alive, idle = set(workers), list()
+    collector, items, pending, results = None, None, list(), dict()
+    failed, skipped = False, set()  # items not dispatched after a failure
+    waiting = dict()  # items waiting for deferred results: worker, results, parts
+
+    def set_items(new_items):
+        nonlocal items, pending, failed
+        items, pending = new_items, list()
+        for i in _get_pending(items):
+            rs = completed.get(journal.get_key(*items[i]))
+            if rs is None:
+                pending.append(i)
+                continue
+            results[i] = [testing.result_from_dict(d) for d in rs]
+            failed |= any(not isinstance(r, testing.TestOk) for r in results[i])
+            if on_results:
+                on_results(results[i])
+
+    def add_results(rs):
+        nonlocal failed
+        failed |= any(not isinstance(r, testing.TestOk) for r in rs)
+        if on_results:
+            on_results(rs)
+
+    def finish(i, rs):
+        results[i] = rs
+        journal.record(*items[i], rs)
+
+    def set_results(w, rs, deferred=0):
+        if w.timer:
+            w.timer.cancel()
+        add_results(rs)
+        if deferred:
+            waiting[w.item] = (w, rs, [None] * deferred)
+        else:
+            finish(w.item, rs)
+        w.item, w.timer = None, None
+
+    def set_deferred(i, n, rs):
+        add_results(rs)
+        _, item_rs, parts = waiting[i]
+        parts[n] = rs
+        if all(p is not None for p in parts):
+            del waiting[i]
+            finish(i, item_rs + [r for p in parts for r in p])
+
+    while alive and (items is None or len(results) + len(skipped) < len(items)):
+        w, msg = events.get()
+        if msg is None:
+            alive.discard(w)
+            if w in idle:
+                idle.remove(w)
+            crashed = w.killed
+            if w is collector:  # no cases, one item per module
+                collector, crashed = None, True
+                set_items(_get_items(modules, dict()))
+            elif w.item is not None:
+                set_results(w, _get_fail(items[w.item], _get_crash_log(w)))
+                crashed = True
+            for i in [i for i, (ww, _, _) in waiting.items() if ww is w]:
+                _, rs, parts = waiting.pop(i)
+                fail = _get_fail(items[i], _get_crash_log(w))
+                add_results(fail)
+                finish(i, rs + [r for p in parts if p for r in p] + fail)
+            if crashed and new_worker:
+                w = new_worker()
+                print(f"{HEADER}Worker replaced by <{w.name}>{ENDC}")
+                workers.append(w)
+                alive.add(w)
+        elif msg["op"] == "ready":
+            idle.append(w)
+        elif msg["op"] == "collected":
+            collected = msg["cases"]
+            if affected_base:
+                modules, collected = affected.select(modules, collected, affected_base)
+            if config.SHARD:
+                modules, collected = shard.select(modules, collected)
+            collector = None
+            set_items(_get_items(modules, collected))
+            idle.append(w)
+        elif msg["op"] == "results":
+            rs = [testing.result_from_dict(d) for d in msg["results"]]
+            set_results(w, rs, msg.get("deferred", 0))
+            idle.append(w)
+        elif msg["op"] == "deferred":
+            if msg["item"] in waiting:
+                rs = [testing.result_from_dict(d) for d in msg["results"]]
+                set_deferred(msg["item"], msg["n"], rs)
+        elif msg["op"] == "hung":
+            if w.item == msg["item"]:  # still on it
+                log = (
+                    f"Worker hung for over {config.WORKER_TIMEOUT} s, killed, "
+                    f"see: <log/{w.name}.txt>"
+                )
+                set_results(w, _get_fail(items[w.item], log))
+                w.killed = True
+                w.kill()  # its exit follows
+        # Fail fast
+        if config.FAIL_FAST and pending and failed:
+            print(f"\n{HEADER}Stopped at the first failure{ENDC}")
+            skipped.update(pending)
+            pending = list()
+        # Dispatch
+        if items is None:
+            if collector is None and idle:
+                collector = idle.pop(0)
+                collector.send(
+                    {"op": "collect", "modules": modules, "config": config_overrides}
+                )
+        else:
+            while idle and pending:
+                w = idle.pop(0)
+                w.item = pending.pop(0)
+                module, keys = items[w.item]
+                w.send(
+                    {
+                        "op": "run",
+                        "item": w.item,
+                        "module": module,
+                        "cases": keys,
+                        "config": config_overrides,
+                    }
+                )
+                if new_worker and config.WORKER_TIMEOUT:
+                    w.timer = threading.Timer(
+                        config.WORKER_TIMEOUT,
+                        events.put,
+                        args=((w, {"op": "hung", "item": w.item}),),
+                    )
+                    w.timer.daemon = True
+                    w.timer.start()
+
+    # Stop workers
+    for w in alive:
+        w.send({"op": "quit"})
+
+    # Merge results in order, failing the items left without workers
+    merged = list()
+    if items is None:
+        items = _get_items(modules, dict())
+    for i, item in enumerate(items):
+        if i in skipped:
+            continue
+        if i not in results:
+            results[i] = _get_fail(item, "No worker left")
+            if on_results:
+                on_results(results[i])
+        merged.extend(results[i])
+    return merged
+
+
+def run_pool(
+    script_pathfile,
+    blender_pathfile,
+    test_py_module,
+    requested_test_names=None,
+    jobs=2,
+    config_overrides=None,
+    affected_base=None,
+    resume=False,
+):
+    """!
+    Execute tests from test_py_module on a pool of jobs Blender workers,
+    supervised: crashed and hung workers are replaced, completed work items
+    are recorded into the journal, and skipped if resume.
+    """
+    modules = get_modules(test_py_module, requested_test_names)
+    print(f"{HEADER}Run on {jobs} Blender workers...{ENDC}")
+    Path("log").mkdir(parents=True, exist_ok=True)
+    if scheduler.can_share():  # share the fds cores budget among workers
+        cores = {
+            "FDS_CORES": scheduler.get_budget(),
+            "FDS_CORES_DIR": os.path.abspath(os.path.join("log", "fds_cores")),
+        }
+    else:  # split it
+        cores = {"FDS_CORES": max(1, scheduler.get_budget() // jobs)}
+    config_overrides = {**cores, **(config_overrides or dict())}
+    command = run_blender.blender_command(
+        script_pathfile, blender_pathfile, options=["--worker"]
+    )
+    events = queue.Queue()
+    names = (f"worker_{i}" for i in itertools.count())
+    workers = [_BlenderWorker(next(names), command, events) for _ in range(jobs)]
+    completed = journal.start(resume)
+    if completed:
+        print(f"{HEADER}Resume, {len(completed)} work items completed{ENDC}")
+    reporter = reporters.get_reporters(requested_test_names)
+    try:
+        results = dispatch(
+            workers,
+            events,
+            modules,
+            config_overrides,
+            affected_base,
+            reporter.results,
+            new_worker=lambda: _BlenderWorker(next(names), command, events),
+            completed=completed,
+        )
+    finally:
+        journal.finish()
+    for w in workers:
+        w.process.wait()
+    reporter.finish(results)
+    history.update(results)
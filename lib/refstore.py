@@ -0,0 +1,210 @@
+"""!
+Reference dirs, each with a manifest of the hashes of its files,
+set incrementally by hardlinking blobs from a content-addressed store,
+so that identical files, such as geometries, are stored once.
+Files are the same when their normalized contents are, eg. without header lines.
+"""
+
+import hashlib, json, os, shutil, stat, tempfile, threading
+from pathlib import Path
+from . import config, affected
+
+## Manifest of the files of each reference dir
+MANIFEST = "manifest.json"
+
+## Text files normalized without their header lines, starting with "!"
+TEXT_EXTENSIONS = (".fds", ".ge1")
+
+_path = os.path.abspath(config.REF_STORE_PATH)  # the working dir may change, see bl_io
+
+_lock = threading.Lock()  # is_same is called by the compare threads
+_toplevels = dict()  # dir: its git work tree, or None
+_unchanged = dict()  # git work tree: its tracked files without changes
+
+
+def get_entry(filepath) -> dict:
+    """!
+    Get the manifest entry of a file, reading it once:
+    {size, sha256 of its bytes, content sha256 of its normalized content}.
+    """
+    h = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        if filepath.endswith(TEXT_EXTENSIONS):
+            data = f.read()
+            h.update(data)
+            content = hashlib.sha256(
+                b"\n".join(l for l in data.splitlines() if not l.startswith(b"!"))
+            ).hexdigest()
+        else:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+            content = None
+    sha256 = h.hexdigest()
+    return {
+        "size": os.path.getsize(filepath),
+        "sha256": sha256,
+        "content": content or sha256,
+    }
+
+
+def build_manifest(path) -> dict:
+    """!
+    Build the manifest of the files in path, not recursively, by name.
+    """
+    return {
+        entry.name: get_entry(entry.path)
+        for entry in sorted(os.scandir(path), key=lambda e: e.name)
+        if entry.is_file() and entry.name != MANIFEST
+    }
+
+
+def get_manifest(path) -> dict:
+    """!
+    Get the manifest of the reference dir path, empty if missing.
+    """
+    try:
+        with open(os.path.join(path, MANIFEST), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return dict()
+
+
+def write_manifest(path, manifest):
+    """!
+    Write the manifest of the reference dir path.
+    """
+    with open(os.path.join(path, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+        f.write("\n")
+
+
+def _get_blob_filepath(digest) -> str:
+    return os.path.join(_path, digest[:2], digest)
+
+
+def _is_unchanged(filepath) -> bool:
+    """!
+    Check if a file is tracked by git without uncommitted changes,
+    listing them once per run for each work tree.
+    """
+    path = os.path.realpath(os.path.dirname(filepath))
+    with _lock:
+        try:
+            repo = affected.get_toplevel(path, _toplevels)
+            if repo and repo not in _unchanged:
+                _unchanged[repo] = affected.get_unchanged_files(repo)
+        except OSError:  # no git
+            repo = _toplevels[path] = None
+    filepath = os.path.join(path, os.path.basename(filepath))
+    return bool(repo) and filepath in _unchanged[repo]
+
+
+def _is_trusted(ref_filepath, ref_entry) -> bool:
+    """!
+    Check if the manifest entry of a reference file can be trusted without reading it:
+    the file is committed unchanged, eg. in a fresh checkout,
+    or it is still linked to its read-only blob.
+    """
+    if _is_unchanged(ref_filepath):
+        return True
+    blob_filepath = _get_blob_filepath(ref_entry["sha256"])
+    return os.path.exists(blob_filepath) and os.path.samefile(
+        ref_filepath, blob_filepath
+    )
+
+
+def is_same(ref_filepath, entry, manifest) -> bool:
+    """!
+    Check if a reference file has the same normalized content of the entry
+    of another file, by its manifest if trusted, see _is_trusted(),
+    otherwise by hashing it, eg. edited by hand.
+    """
+    ref_entry = manifest.get(os.path.basename(ref_filepath))
+    try:
+        if not ref_entry or not _is_trusted(ref_filepath, ref_entry):
+            ref_entry = get_entry(ref_filepath)
+    except OSError:  # missing
+        return False
+    return ref_entry["content"] == entry["content"]
+
+
+def _put_blob(filepath, digest) -> str:
+    """!
+    Put a file into the store, read-only as it is shared, and return its blob.
+    """
+    blob_filepath = _get_blob_filepath(digest)
+    if not os.path.exists(blob_filepath):
+        Path(blob_filepath).parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_filepath = tempfile.mkstemp(dir=os.path.dirname(blob_filepath))
+        os.close(fd)
+        shutil.copyfile(filepath, tmp_filepath)
+        os.chmod(tmp_filepath, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        os.replace(tmp_filepath, blob_filepath)
+    return blob_filepath
+
+
+def _link(blob_filepath, filepath):
+    """!
+    Replace filepath by a hardlink to the blob, or by a copy across filesystems.
+    """
+    if os.path.exists(filepath) and os.path.samefile(blob_filepath, filepath):
+        return  # already linked, a rename would leave the tmp link
+    tmp_filepath = f"{filepath}.{os.getpid()}.tmp"
+    try:
+        os.link(blob_filepath, tmp_filepath)
+    except OSError:
+        shutil.copyfile(blob_filepath, tmp_filepath)
+    os.replace(tmp_filepath, filepath)
+
+
+def set_ref(ref_path, path) -> list:
+    """!
+    Set the reference dir ref_path to the content of path, recursively,
+    writing only the changed files, and return their filepaths.
+    """
+    Path(ref_path).mkdir(parents=True, exist_ok=True)
+    manifest = get_manifest(ref_path)
+    new_manifest, changed = dict(), list()
+    for entry in os.scandir(path):
+        ref_filepath = os.path.join(ref_path, entry.name)
+        if entry.is_dir():
+            changed.extend(set_ref(ref_filepath, entry.path))
+            continue
+        e = get_entry(entry.path)
+        if is_same(ref_filepath, e, manifest):
+            new_manifest[entry.name] = manifest[entry.name]  # keep the old file
+        else:
+            _link(_put_blob(entry.path, e["sha256"]), ref_filepath)
+            new_manifest[entry.name] = e
+            changed.append(ref_filepath)
+    for entry in os.scandir(ref_path):  # rm the others
+        if entry.name == MANIFEST or os.path.exists(os.path.join(path, entry.name)):
+            continue
+        if entry.is_dir():
+            shutil.rmtree(entry.path)
+        else:
+            os.remove(entry.path)
+        changed.append(entry.path)
+    if new_manifest != manifest:
+        write_manifest(ref_path, new_manifest)
+    return changed
+
+
+def update_manifests(path) -> list:
+    """!
+    Write the manifests of the reference dirs in the dir tree path,
+    eg. after editing them by hand, and return the changed ones.
+    Reference dirs are in dirs named *_ref.
+    """
+    changed = list()
+    for p, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+        parts = os.path.relpath(p, path).split(os.sep)
+        if not any(d.endswith("_ref") for d in parts[:-1]):
+            continue
+        if any(f != MANIFEST for f in files):
+            manifest = build_manifest(p)
+            if manifest != get_manifest(p):
+                write_manifest(p, manifest)
+                changed.append(p)
+    return changed
@@ -0,0 +1,256 @@
+"""!
+Reporters of test results, streamed while the run is going:
+on console, into the text log, as JSON Lines and as JUnit XML.
+"""
+
+import datetime, json, os
+from pathlib import Path
+from xml.sax.saxutils import escape, quoteattr
+from . import config, testing, timing
+from .bcolors import HEADER, ENDC, OKGREEN, FAIL
+
+
+class Reporter:
+    """!
+    Reporter interface, results are numbered from 1 in order of arrival.
+    """
+
+    def start(self):
+        pass
+
+    def result(self, r, n):
+        pass
+
+    def finish(self, results):
+        pass
+
+
+class ConsoleReporter(Reporter):
+    """!
+    Report on console: 0 summary only, 1 failures in full, 2 all results in full.
+    """
+
+    def __init__(self, verbosity=1):
+        self.verbosity = verbosity
+
+    def result(self, r, n):
+        ok = isinstance(r, testing.TestOk)
+        if self.verbosity >= 2 or (self.verbosity == 1 and not ok):
+            print(f"{ok and OKGREEN or FAIL}{r.detail}{ENDC}")
+        elif self.verbosity == 1:
+            print(f"{OKGREEN}Ok{ENDC} {r.package}: {r.name}")
+
+    def finish(self, results):
+        packages = dict()  # package: [ok, failed]
+        for r in results:
+            counts = packages.setdefault(r.package, [0, 0])
+            counts[not isinstance(r, testing.TestOk)] += 1
+        print(f"\n{HEADER}Overall test results (see details in file):{ENDC}")
+        for key, (nk, nf) in packages.items():
+            nt = nf + nk
+            print(
+                f"{nt:>7} = {OKGREEN}{nk:>5} ok{ENDC} + {FAIL}{nf:>5} failed{ENDC} in {key}"
+            )
+        print(f"{len(results):>7} completed")
+        print(f"\n{HEADER}Timings:{ENDC}")
+        print("\n".join(timing.get_summary(results, qty=config.TIMING_SUMMARY_QTY)))
+
+
+class _FileReporter(Reporter):
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.f = None
+
+    def start(self):
+        Path(self.filepath).parent.mkdir(parents=True, exist_ok=True)
+        self.f = open(self.filepath, "w")
+
+    def write(self, text):
+        self.f.write(text)
+        self.f.flush()  # for live readers and crashed runs
+
+    def finish(self, results):
+        self.f.close()
+
+
+class TextReporter(_FileReporter):
+    """!
+    Report failures in full into the text log, with the timing table at the end.
+    """
+
+    def result(self, r, n):
+        if not isinstance(r, testing.TestOk):
+            self.write(f"\n--- #{n} <{r.package}> ---\n{r.detail}\n")
+
+    def finish(self, results):
+        self.write("\n\n--- Timings ---\n")
+        self.write("\n".join(timing.get_table(results)) + "\n")
+        super().finish(results)
+
+
+class JsonlReporter(_FileReporter):
+    """!
+    Report each result as a json line, referencing its log in the text log.
+    """
+
+    def __init__(self, filepath, log_filepath=None):
+        super().__init__(filepath)
+        self.log_filepath = log_filepath
+
+    def result(self, r, n):
+        ok = isinstance(r, testing.TestOk)
+        log = None
+        if not ok and self.log_filepath:
+            log = f"{self.log_filepath}#{n}"
+        self.write(
+            json.dumps(
+                {
+                    "n": n,
+                    "status": ok and "ok" or "fail",
+                    "package": r.package,
+                    "name": r.name,
+                    "case": r.case,
+                    "timings": r.timings,
+                    "wall": sum(wall for _, wall, _ in r.timings),
+                    "log": log,
+                }
+            )
+            + "\n"
+        )
+
+
+def _read_log(ref, r, jsonl_filepath):
+    # Read the log of result r from its ref "<text log>#n",
+    # the text log is looked for next to the jsonl file too, eg. a CI artifact
+    filepath, n = ref.rsplit("#", 1)
+    if not os.path.exists(filepath):
+        filepath = os.path.join(
+            os.path.dirname(jsonl_filepath), os.path.basename(filepath)
+        )
+    try:
+        with open(filepath, "r") as f:
+            text = f.read()
+    except OSError:
+        return f"Log not found: <{ref}>"
+    head = f"\n--- #{n} <{r.package}> ---\n\n---\n"  # see TextReporter and detail
+    start = text.find(head)
+    end = text.find(f"\n{r.label}\n---\n", start)
+    if start < 0 or end < 0:
+        return f"Log not found: <{ref}>"
+    return text[start + len(head) : end]
+
+
+def read_jsonl(filepath) -> list:
+    """!
+    Read the results reported by a JsonlReporter, with their logs from the text log.
+    """
+    results = list()
+    with open(filepath, "r") as f:
+        for line in f:
+            d = json.loads(line)
+            cls = d["status"] == "ok" and testing.TestOk or testing.TestFail
+            r = cls(d["package"], d["name"])
+            r.case = d["case"]
+            r.timings = [tuple(t) for t in d["timings"]]
+            if d["log"]:
+                r.log = _read_log(d["log"], r, filepath)
+            results.append(r)
+    return results
+
+
+class JUnitReporter(Reporter):
+    """!
+    Report as JUnit XML, one testsuite per package with its counts,
+    as results of the same package may arrive apart, eg. from many workers.
+    The document is rewritten atomically after each result,
+    so that it is complete and valid while the run is going, and after a crash.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.suites = dict()  # package: [testcases xml, failures, time]
+
+    def start(self):
+        Path(self.filepath).parent.mkdir(parents=True, exist_ok=True)
+        self._rewrite()
+
+    def result(self, r, n):
+        suite = self.suites.setdefault(r.package, [list(), 0, 0.0])
+        wall = sum(wall for _, wall, _ in r.timings)
+        xml = (
+            f"<testcase classname={quoteattr(r.package)} name={quoteattr(r.name)} "
+            f'time="{wall:.3f}">'
+        )
+        if not isinstance(r, testing.TestOk):
+            log = r.log or ""
+            message = log.partition("\n")[0]
+            xml += f"<failure message={quoteattr(message)}>{escape(log)}</failure>"
+            suite[1] += 1
+        suite[0].append(xml + "</testcase>\n")
+        suite[2] += wall
+        self._rewrite()
+
+    def _rewrite(self):
+        tmp_filepath = f"{self.filepath}.tmp"
+        with open(tmp_filepath, "w") as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n<testsuites>\n')
+            for package, (testcases, failures, time) in self.suites.items():
+                f.write(
+                    f'<testsuite name={quoteattr(package)} tests="{len(testcases)}" '
+                    f'failures="{failures}" time="{time:.3f}">\n'
+                )
+                f.writelines(testcases)
+                f.write("</testsuite>\n")
+            f.write("</testsuites>\n")
+        os.replace(tmp_filepath, self.filepath)  # atomic, for live readers
+
+
+class Reporters(Reporter):
+    """!
+    Stream results to many reporters.
+    """
+
+    def __init__(self, reporters):
+        self.reporters = reporters
+        self.n = 0
+
+    def start(self):
+        for reporter in self.reporters:
+            reporter.start()
+
+    def results(self, results):
+        for r in results:
+            self.n += 1
+            for reporter in self.reporters:
+                reporter.result(r, self.n)
+
+    def finish(self, results):
+        for reporter in self.reporters:
+            reporter.finish(results)
+
+
+def get_reporters(requested_test_names=None) -> Reporters:
+    """!
+    Get the config.REPORTERS, started, writing into log/<date>_<test names>.*
+    """
+    names = "_".join(requested_test_names or ()) or "all"
+    if config.SHARD:
+        names += f"_shard{config.SHARD[0]}of{config.SHARD[1]}"
+    stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M")
+    filepath = os.path.join("log", f"{stamp}_{names}")
+    reporters = list()
+    for name in config.REPORTERS:
+        if name == "console":
+            reporters.append(ConsoleReporter(config.VERBOSITY))
+        elif name == "text":
+            reporters.append(TextReporter(f"{filepath}.txt"))
+        elif name == "jsonl":
+            log_filepath = "text" in config.REPORTERS and f"{filepath}.txt" or None
+            reporters.append(JsonlReporter(f"{filepath}.jsonl", log_filepath))
+        elif name == "junit":
+            reporters.append(JUnitReporter(f"{filepath}.xml"))
+        else:
+            raise ValueError(f"Unknown reporter: <{name}>")
+    reporters = Reporters(reporters)
+    reporters.start()
+    return reporters
@@ -1,39 +1,58 @@
 import subprocess, sys
 
 
-def _first_run(script_pathfile, blender_pathfile):
-    print("Run Blender...")
-    # Prepare process
-    process = [
+def in_blender() -> bool:
+    """!
+    Check if running in Blender.
+    """
+    try:
+        import bpy
+    except ModuleNotFoundError:
+        return False
+    return True
+
+
+def get_user_args() -> list:
+    """!
+    Get user options, following the "--" separator when running in Blender.
+    """
+    if "--" in sys.argv:
+        return sys.argv[sys.argv.index("--") + 1 :]
+    return sys.argv[1:]
+
+
+def blender_command(script_pathfile, blender_pathfile, options) -> list:
+    """!
+    Get the command running script_pathfile in background Blender with user options.
+    """
+    return [
         blender_pathfile,
         "--background",
         "--python",
         script_pathfile,
         "--",  # allow following user options
+        *options,
     ]
-    # Add user options
-    options = sys.argv[1:]  # send user options
-    process.extend(options)
+
+
+def _first_run(script_pathfile, blender_pathfile):
+    print("Run Blender...")
+    # Prepare process, sending user options
+    process = blender_command(script_pathfile, blender_pathfile, sys.argv[1:])
     # Run myself in Blender (second run)
-    try:
-        subprocess.run(
-            process,
-            check=True,
-            # timeout=3600,
-        )
-    except subprocess.CalledProcessError as err:
-        raise err
-    # Exit here when first run is finished
+    c = subprocess.run(
+        process,
+        # timeout=3600,
+    )
+    # Exit here when first run is finished, with its exit code
     # otherwise main would run again
-    exit(0)
+    exit(c.returncode)
 
 
 def run_script_in_blender(script_pathfile, blender_pathfile):
     """!
     Launch current script in Blender.
     """
-    try:
-        import bpy  # Blender running?
-    except ModuleNotFoundError:  # No
+    if not in_blender():
         _first_run(script_pathfile, blender_pathfile)
     # Blender is running now
@@ -1,5 +1,9 @@
-import os, subprocess
-from .testing import TestOk, TestFail, TestException
+import os, re, signal, subprocess, shutil, tempfile, threading
+from collections import deque
+from pathlib import Path
+from . import config, cases, namelist, scheduler, smoke, timing
+from .testing import TestOk, TestFail, TestEnvFail, TestException
+from .cases import case, walk_tree
 
 
 def run_command_on_tree(
@@ -13,49 +17,182 @@ def run_command_on_tree(
     timeout=3600,
 ):
     """!
-    Run command on dir tree.
+    Run command on dir tree, concurrently. Results are deferred.
     """
     results = list()
-    for p, dirs, files in os.walk(path):
-        if exclude_dirs:
-            dirs[:] = [d for d in dirs if d not in exclude_dirs]
-        for filename in files:
-            if filename.endswith(extension):
-                if exclude_files and filename in exclude_files:
-                    continue
-                filepath = os.path.join(p, filename)
-                results.extend(
-                    run_command(package, filepath, command, success, timeout)
-                )
+    for filepath in walk_tree(package, path, extension, exclude_dirs, exclude_files):
+        results.extend(run_command(package, filepath, command, success, timeout))
     return results
 
 
+def get_mpi_processes(filepath) -> int:
+    """!
+    Get the number of MPI processes of an fds case, from its MESH MPI_PROCESS.
+    """
+    ps = [
+        n.params["MPI_PROCESS"][0]
+        for n in namelist.iter_namelists(filepath)
+        if n.group == "MESH" and n.params.get("MPI_PROCESS")
+    ]
+    return ps and int(max(ps)) + 1 or 1
+
+
+def _signal(process, sig):
+    # Signal the process with its descendants, in its own session on POSIX
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, sig)
+        elif sig == signal.SIGTERM:
+            process.terminate()
+        else:
+            process.kill()
+    except ProcessLookupError:  # already exited
+        pass
+
+
+def _stop(process):
+    _signal(process, signal.SIGTERM)  # let mpiexec stop its processes
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        pass
+    # also its descendants left, that would keep its output open
+    _signal(process, getattr(signal, "SIGKILL", signal.SIGTERM))
+
+
+def _run(
+    package, name, args, path, success, timeout, cleanup, log_filepath, key
+) -> list:
+    """!
+    Run the command, timing its results of case key.
+    """
+    timings = list()
+    with timing.phase("fds", timings, cpu=False):
+        results = _monitor(
+            package, name, args, path, success, timeout, cleanup, log_filepath
+        )
+    for r in results:
+        r.case, r.timings = key, timings
+    return results
+
+
+def _monitor(
+    package, name, args, path, success, timeout, cleanup, log_filepath
+) -> list:
+    """!
+    Run the command streaming its output to log_filepath, line by line.
+    Stop it as soon as a fatal error appears, or on timeout.
+    Only the head and tail lines of its output are kept in the result log.
+    """
+    head, tail, skipped = list(), deque(maxlen=config.FDS_LOG_TAIL), 0
+    succeeded, fatal, expired = False, None, threading.Event()
+    fatal_re = re.compile(config.FDS_FATAL_PATTERN)
+    Path(log_filepath).parent.mkdir(parents=True, exist_ok=True)
+    try:
+        with open(log_filepath, "w") as f, subprocess.Popen(
+            args,
+            cwd=path,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            start_new_session=True,  # its process group, see _stop()
+        ) as process:
+
+            def expire():
+                expired.set()
+                _stop(process)
+
+            timer = threading.Timer(timeout, expire)
+            timer.start()
+            try:
+                for line in process.stdout:
+                    f.write(line)
+                    if len(head) < config.FDS_LOG_HEAD:
+                        head.append(line)
+                    else:
+                        if len(tail) == tail.maxlen:
+                            skipped += 1
+                        tail.append(line)
+                    if not succeeded and success in line:
+                        succeeded = True
+                    if fatal is None and fatal_re.search(line):
+                        fatal = line.strip()
+                        timer.cancel()  # stopped for its fatal error
+                        _stop(process)
+                returncode = process.wait()
+            finally:
+                timer.cancel()
+    except (subprocess.SubprocessError, OSError) as err:
+        return [TestEnvFail(package, name, f"Subprocess error: {err}")]
+    finally:
+        if cleanup:
+            shutil.rmtree(cleanup, ignore_errors=True)
+    log = "".join(head)
+    if skipped:
+        log += f"... {skipped} lines skipped, see: <{log_filepath}>\n"
+    log += "".join(tail)
+    if fatal:
+        return [TestFail(package, name, f"Fatal error: <{fatal}>\n{log}")]
+    if expired.is_set():
+        return [TestEnvFail(package, name, f"Timeout after {timeout} s\n{log}")]
+    if returncode:
+        return [TestFail(package, name, f"Exit code {returncode}\n{log}")]
+    if succeeded:
+        return [TestOk(package, name, log)]
+    return [TestFail(package, name, log)]
+
+
+@case
 def run_command(
     package,
     filepath,
     command="fds",
     success="STOP:",
     timeout=3600,
+    copy=False,
 ) -> list:
     """!
-    Execute FDS case
+    Execute FDS case in the background, with mpiexec if it has MPI processes.
+    It takes one core of the scheduler budget per MPI process.
+    If copy, run on a copy of its dir, eg. when it is a temporary dir.
+    If config.FDS_SMOKE, smoke run a rewritten copy, see smoke.write_smoke_case().
+    Its full output is written to config.FDS_LOG_PATH.
+    Results are deferred, see cases.drain().
     """
-    path, _ = os.path.split(filepath)
+    path, filename = os.path.split(filepath)
     name = f"{command} {filepath}"
-    try:
-        c = subprocess.run(
-            [command, filepath],
-            cwd=path,
-            capture_output=True,
-            text=True,
-            timeout=timeout,
-            check=True,
-            encoding="utf-8",
+    n = filepath.endswith(".fds") and get_mpi_processes(filepath) or 1
+    args = [command, filename]
+    if n > 1:
+        args = [config.MPIEXEC, "-n", str(n), *args]
+    is_smoke = config.FDS_SMOKE and filepath.endswith(".fds")
+    cleanup = None
+    if copy or is_smoke:
+        cleanup = tempfile.mkdtemp(prefix="fds_run_")  # removed after the run
+        path = shutil.copytree(src=path, dst=os.path.join(cleanup, "case"))
+    if is_smoke:
+        name = f"{command} (smoke) {filepath}"
+        smoke.write_smoke_case(os.path.join(path, filename))
+    key = cases.get_current() or cases.case_key(package, filepath)
+    log_filepath = os.path.abspath(  # for the run thread
+        os.path.join(
+            config.FDS_LOG_PATH, re.sub(r"[^\w.-]+", "_", f"{key}_{filename}.txt")
         )
-    except subprocess.CalledProcessError as err:
-        return (TestFail(package, name, f"Unknown subprocess error: {err}"),)
-    log = f"stdout:\n{c.stdout}\nstderr:\n{c.stderr}"
-    print()
-    if log.find(success) > 0:
-        return (TestOk(package, name, log),)
-    return (TestFail(package, name, log),)
+    )
+    future = scheduler.submit(
+        _run,
+        package,
+        name,
+        args,
+        path,
+        success,
+        timeout,
+        cleanup,
+        log_filepath,
+        key,
+        slots=n,
+    )
+    cases.defer(future)
+    return list()
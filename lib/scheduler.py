@@ -0,0 +1,93 @@
+"""!
+Run jobs in the background, under a budget of cpu cores.
+Each job takes its slots, eg. one per MPI process, and jobs start in submission order.
+The budget can be shared by processes, eg. the pool workers, see config.FDS_CORES_DIR.
+"""
+
+import os, threading, time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from . import config
+
+_cond = threading.Condition()
+_queue = deque()  # tickets of the jobs waiting for their slots, in order
+_used = 0  # slots in use
+_executor = None
+
+
+def get_budget() -> int:
+    """!
+    Get the budget of cpu cores.
+    """
+    return config.FDS_CORES or os.cpu_count() or 1
+
+
+def can_share() -> bool:
+    """!
+    Check if the budget can be shared by processes, with lock files.
+    """
+    try:
+        import fcntl
+    except ImportError:  # eg. on Windows
+        return False
+    return True
+
+
+def _acquire_shared(slots) -> list:
+    """!
+    Acquire slots of the budget shared by processes, one locked file each,
+    unlocked when closed or when their process exits.
+    Processes acquire one at a time, so larger jobs are not overtaken.
+    """
+    import fcntl
+
+    path = config.FDS_CORES_DIR
+    os.makedirs(path, exist_ok=True)
+    files, i = list(), 0
+    with open(os.path.join(path, "gate.lock"), "w") as gate:
+        fcntl.flock(gate, fcntl.LOCK_EX)
+        while len(files) < slots:
+            f = open(os.path.join(path, f"core_{i}.lock"), "w")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                files.append(f)
+            except BlockingIOError:  # in use
+                f.close()
+            i = (i + 1) % get_budget()
+            if i == 0 and len(files) < slots:
+                time.sleep(0.1)
+    return files
+
+
+def _run(ticket, slots, func, args):
+    global _used
+    with _cond:
+        _cond.wait_for(lambda: _queue[0] is ticket and _used + slots <= get_budget())
+        _queue.popleft()
+        _used += slots
+        _cond.notify_all()
+    files = list()
+    try:
+        if config.FDS_CORES_DIR:
+            files = _acquire_shared(slots)
+        return func(*args)
+    finally:
+        for f in files:
+            f.close()
+        with _cond:
+            _used -= slots
+            _cond.notify_all()
+
+
+def submit(func, *args, slots=1):
+    """!
+    Run func(*args) in the background, as soon as slots are free in the budget.
+    Jobs larger than the budget take it all. Return a future of its result.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=get_budget())
+    ticket = object()
+    with _cond:
+        _queue.append(ticket)
+    return _executor.submit(_run, ticket, min(slots, get_budget()), func, args)
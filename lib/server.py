@@ -0,0 +1,123 @@
+"""!
+Persistent Blender server, kept warm between verify.py runs,
+serving test requests on a Unix socket.
+"""
+
+import importlib, os, queue, socket, sys
+from pathlib import Path
+from . import config, pool, worker, reporters, history
+from .bcolors import HEADER, ENDC
+
+
+def _reload_tests(test_py_module):
+    """!
+    Reload already imported test modules, to pick up their changes.
+    """
+    for name, module in list(sys.modules.items()):
+        if name.startswith(test_py_module + "."):
+            importlib.reload(module)
+
+
+def _get_config() -> dict:
+    return {k: v for k, v in vars(config).items() if k.isupper()}
+
+
+def _set_config(saved):
+    """!
+    Restore the config, as saved by _get_config(), for the next clients.
+    """
+    for name in [k for k in vars(config) if k.isupper() and k not in saved]:
+        delattr(config, name)
+    for name, value in saved.items():
+        setattr(config, name, value)
+
+
+def serve(test_py_module, socket_path=config.SERVER_SOCKET, reset=None):
+    """!
+    Serve test requests from clients, one at a time, until shutdown.
+    The socket is accessible to its user only, as requests set the config.
+    Refuse to start if another server is live on the socket.
+    """
+    if os.path.exists(socket_path):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            try:
+                s.connect(socket_path)
+            except OSError:  # stale, left by a crashed server
+                os.unlink(socket_path)
+            else:
+                raise Exception(f"Server already running on <{socket_path}>")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        umask = os.umask(0o177)  # no access window before chmod
+        try:
+            s.bind(socket_path)
+        finally:
+            os.umask(umask)
+        os.chmod(socket_path, 0o600)
+        s.listen()
+        print(f"{HEADER}Serving on <{socket_path}>...{ENDC}")
+        try:
+            shutdown = False
+            while not shutdown:
+                conn, _ = s.accept()
+                with conn, conn.makefile("r", encoding="utf-8") as rfile, conn.makefile(
+                    "w", encoding="utf-8"
+                ) as wfile:
+                    _reload_tests(test_py_module)
+                    saved = _get_config()
+                    try:
+                        shutdown = worker.serve(rfile, wfile, reset=reset)
+                    except (OSError, ValueError) as err:
+                        print(f"Connection lost: {err}")
+                    finally:
+                        _set_config(saved)  # requests override it
+        finally:
+            os.unlink(socket_path)
+    print(f"{HEADER}Server shut down{ENDC}")
+
+
+def _connect(socket_path, events):
+    Path("log").mkdir(parents=True, exist_ok=True)
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(socket_path)
+    except OSError as err:
+        raise Exception(f"No server on <{socket_path}>, start it with --serve: {err}")
+    rfile = s.makefile("r", encoding="utf-8")
+    wfile = s.makefile("w", encoding="utf-8")
+    return pool.Worker("server", rfile, wfile, events)
+
+
+def run_on_server(
+    test_py_module,
+    requested_test_names=None,
+    config_overrides=None,
+    affected_base=None,
+    socket_path=config.SERVER_SOCKET,
+):
+    """!
+    Execute tests from test_py_module on the persistent Blender server.
+    """
+    modules = pool.get_modules(test_py_module, requested_test_names)
+    print(f"{HEADER}Run on server <{socket_path}>...{ENDC}")
+    events = queue.Queue()
+    reporter = reporters.get_reporters(requested_test_names)
+    results = pool.dispatch(
+        [_connect(socket_path, events)],
+        events,
+        modules,
+        config_overrides,
+        affected_base,
+        reporter.results,
+    )
+    reporter.finish(results)
+    history.update(results)
+
+
+def shutdown_server(socket_path=config.SERVER_SOCKET):
+    """!
+    Ask the persistent Blender server to shut down.
+    """
+    events = queue.Queue()
+    w = _connect(socket_path, events)
+    events.get()  # ready
+    w.send({"op": "shutdown"})
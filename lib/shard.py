@@ -0,0 +1,70 @@
+"""!
+Deterministic sharding of the cases across CI nodes,
+balanced by their past durations when known, or else by a stable hash.
+"""
+
+import hashlib, statistics
+from . import config, history
+
+
+def parse(text) -> tuple:
+    """!
+    Parse a shard "i/n" into (i, n), with i from 1 to n.
+    """
+    i, n = (int(s) for s in text.split("/"))
+    if not 1 <= i <= n:
+        raise ValueError(f"Bad shard: <{text}>")
+    return i, n
+
+
+def format(shard) -> str:
+    """!
+    Format a shard (i, n) as "i/n".
+    """
+    return "/".join(str(s) for s in shard)
+
+
+def _hash(key) -> int:
+    return int(hashlib.sha1(key.encode("utf-8")).hexdigest(), 16)
+
+
+def assign(keys, n, durations=None) -> dict:
+    """!
+    Assign each key to a shard from 0 to n-1.
+    With durations, the longest keys go first to the least loaded shard,
+    keys of unknown duration are estimated at the median.
+    Without, keys go by their stable hash.
+    """
+    durations = {k: durations[k] for k in keys if k in (durations or dict())}
+    if not durations:
+        return {k: _hash(k) % n for k in keys}
+    estimate = statistics.median(durations.values())
+    loads, assigned = [0.0] * n, dict()
+    for k in sorted(keys, key=lambda k: (-durations.get(k, estimate), k)):
+        i = min(range(n), key=lambda i: (loads[i], i))
+        loads[i] += durations.get(k, estimate)
+        assigned[k] = i
+    return assigned
+
+
+def select(modules, collected, shard=None):
+    """!
+    Select the modules and their collected cases of shard (i, n), default config.SHARD.
+    Modules without cases are assigned whole.
+    Return the selected modules and collected cases.
+    """
+    i, n = shard or config.SHARD
+    keys = [k for m in modules for k in (collected.get(m) or (m,))]
+    assigned = assign(keys, n, history.get_durations())
+    selected_modules, selected = list(), dict()
+    for m in modules:
+        cases = collected.get(m)
+        if cases:
+            cases = {k: ds for k, ds in cases.items() if assigned[k] == i - 1}
+            if cases:
+                selected_modules.append(m)
+                selected[m] = cases
+        elif assigned[m] == i - 1:
+            selected_modules.append(m)
+            selected[m] = cases
+    return selected_modules, selected
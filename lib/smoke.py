@@ -0,0 +1,61 @@
+"""!
+Rewrite fds cases for smoke runs: a few locked time steps and no heavy outputs.
+"""
+
+from . import config, namelist
+
+
+def get_overrides(group, params) -> dict:
+    """!
+    Get the parameter overrides of a smoke run for a namelist group.
+    """
+    if group == "TIME":
+        t_begin = (params.get("T_BEGIN") or (0.0,))[0]
+        return {
+            "T_END": (t_begin + config.FDS_SMOKE_TIME,),
+            "DT": (config.FDS_SMOKE_TIME / config.FDS_SMOKE_STEPS,),
+            "LOCK_TIME_STEP": (True,),
+        }
+    if group == "DUMP":
+        return {"NFRAMES": (1,)}
+    return dict()
+
+
+def write_smoke_case(filepath):
+    """!
+    Rewrite in place the fds case for a smoke run.
+    &TIME and &DUMP records are overridden, or added after &HEAD if missing.
+    config.FDS_SMOKE_DROP records are removed, other lines are untouched.
+    """
+    with open(filepath, "r") as f:
+        lines = f.readlines()
+    spans, head, missing = dict(), 0, ["TIME", "DUMP"]  # start: (end, new lines)
+    for start, end, body in namelist.iter_spans(lines):
+        n = namelist._parse(body, start)
+        if not n:
+            continue
+        if n.group in config.FDS_SMOKE_DROP:
+            spans[start] = end, list()
+        elif n.group in ("TIME", "DUMP"):
+            if n.group in missing:
+                missing.remove(n.group)
+            n.params.update(get_overrides(n.group, n.params))
+            spans[start] = end, [namelist.format_namelist(n) + "\n"]
+        elif n.group == "HEAD" and not head and not spans:
+            head = end
+    new_lines = [
+        namelist.format_namelist(
+            namelist.Namelist(group, get_overrides(group, dict()), None)
+        )
+        + "\n"
+        for group in missing
+    ]
+    new_lines, lineno = lines[:head] + new_lines, head + 1
+    for start in sorted(spans):
+        end, span_lines = spans[start]
+        new_lines.extend(lines[lineno - 1 : start - 1])
+        new_lines.extend(span_lines)
+        lineno = end + 1
+    new_lines.extend(lines[lineno - 1 :])
+    with open(filepath, "w") as f:
+        f.writelines(new_lines)
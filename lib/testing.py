@@ -1,78 +1,194 @@
-import datetime, os
-from pathlib import Path
+import importlib
 from typing import List, Tuple
-from . import import_mod
-from .bcolors import HEADER, ENDC, OKGREEN, FAIL
+from . import config, import_mod, cases, affected, reporters, logstore, history, shard
+from .bcolors import HEADER, ENDC
 
 
-def run_tests(test_py_module, requested_test_names=None):
+def is_requested(key, requested_test_names=None) -> bool:
     """!
-    Execute tests from test_py_module.
+    Check if test key is requested.
+    """
+    return not requested_test_names or any(r in key for r in requested_test_names)
+
+
+def get_requested(test_py_module, requested_test_names=None) -> dict:
+    """!
+    Get the requested test modules names and docs, without importing them.
+    """
+    return {
+        k: doc
+        for k, doc in import_mod.scan_submodules(test_py_module).items()
+        if is_requested(k, requested_test_names)
+    }
+
+
+def list_tests(test_py_module, requested_test_names=None):
+    """!
+    Print the requested test modules names and docs, without Blender.
+    """
+    for k, doc in get_requested(test_py_module, requested_test_names).items():
+        print(f"{HEADER}{k}{ENDC}\n  {doc}")
+
+
+def run_module(item, case_keys=None, on_results=None, futures=None) -> list:
+    """!
+    Run a test module, optionally only on the selected cases, and check its results.
+    Deferred results, such as fds runs, follow the module results.
+    If futures is a list, they are not waited for: their futures are appended to it.
+    Results are sent to on_results as soon as each case ends, the others at the end.
+    """
+    sent = set()
+
+    def on_case_results(rs):
+        sent.update(map(id, rs))
+        on_results(rs)
+
+    with cases.selecting(case_keys), cases.reporting(on_results and on_case_results):
+        try:
+            rs = item.run()
+        finally:
+            if futures is None:
+                deferred = cases.drain()  # eg. fds runs
+            else:
+                deferred = list()
+                futures.extend(cases.take_deferred())
+    if isinstance(rs, _TestResult):
+        results = [rs] + deferred
+    elif isinstance(rs, (List, Tuple)) and all(isinstance(r, _TestResult) for r in rs):
+        results = list(rs) + deferred
+    else:
+        raise Exception(f"<{item}> is sending bad result <{rs}>")
+    if on_results:
+        on_results([r for r in results if id(r) not in sent])
+    return results
+
+
+def collect_module(item) -> dict:
+    """!
+    Collect the case keys of a test module and their deps, without running them.
+    """
+    with cases.collecting() as collected:
+        try:
+            item.run()
+        except Exception:  # eg. preloaded raising TestException
+            pass
+    return collected
+
+
+def run_tests(test_py_module, requested_test_names=None, affected_base=None):
+    """!
+    Execute tests from test_py_module,
+    only the ones affected by changes since affected_base git ref, if set,
+    and only the cases of config.SHARD, if set.
+    Longest cases run first, or last failed first with config.FAILED_FIRST.
     """
-    tests = import_mod.import_submodules(test_py_module, recursive=False)
-    print(f"{HEADER}Available tests:{ENDC}")
-    print("  " + "\n  ".join(tests))
     print(f"{HEADER}Requested tests:{ENDC}")
     print("  " + "\n  ".join(requested_test_names or ("all",)))
 
-    # Run
+    # Select, and import only the selected
+    selected = dict.fromkeys(get_requested(test_py_module, requested_test_names))
+    tests = {k: importlib.import_module(k) for k in selected}
+    if affected_base or config.SHARD:
+        modules = list(selected)
+        collected = {k: collect_module(tests[k]) for k in selected}
+        if affected_base:
+            modules, collected = affected.select(modules, collected, affected_base)
+            print(f"{HEADER}Affected tests since <{affected_base}>:{ENDC}")
+            print("  " + "\n  ".join(modules or ("none",)))
+        if config.SHARD:
+            modules, collected = shard.select(modules, collected)
+            print(f"{HEADER}Tests of shard {shard.format(config.SHARD)}:{ENDC}")
+            print("  " + "\n  ".join(modules or ("none",)))
+        selected = {m: collected[m] and list(collected[m]) or None for m in modules}
+
+    # Run, by past durations and outcomes
+    order = history.get_order(config.FAILED_FIRST)
+    reporter = reporters.get_reporters(requested_test_names)
     results = list()
-    for key, item in tests.items():
-        if requested_test_names and not any(r in key for r in requested_test_names):
-            continue
-        print(f"\n{HEADER}Run <{key}>...{ENDC}")
-        rs = item.run()
-        # Check and pile results
-        if isinstance(rs, _TestResult):
-            results.append(rs)
-        elif isinstance(rs, (List, Tuple)) and isinstance(rs[0], _TestResult):
+    with cases.ordering(order):
+        for key in sorted(selected, key=order):
+            print(f"\n{HEADER}Run <{key}>...{ENDC}")
+            rs = run_module(tests[key], selected[key], reporter.results)
             results.extend(rs)
-        else:
-            raise Exception(f"<{item}> is sending bad result <{rs}>")
-            
-    # Classify failed by test
-    packages = dict()
-    for r in results:
-        if r.package not in packages:
-            packages[r.package] = list((list(), list()))
-        if isinstance(r, TestOk):
-            packages[r.package][0].append(r)
-        else:
-            packages[r.package][1].append(r)
-
-    # Output, on screen
-    print(f"\n{HEADER}Overall test results (see details in file):{ENDC}")
-    for key, value in packages.items():
-        nk, nf = len(value[0]), len(value[1])
-        nt = nf + nk
-        print(
-            f"{nt:>7} = {OKGREEN}{nk:>5} ok{ENDC} + {FAIL}{nf:>5} failed{ENDC} in {key}"
-        )
-    print(f"{len(results):>7} completed")
-
-    # Output, on file
-    filename = f"{datetime.datetime.now().strftime('%Y%m%d_%H%M')}_{'_'.join(requested_test_names) or 'all'}.txt"
-    filepath = os.path.join("log", filename)
-    Path("log").mkdir(parents=True, exist_ok=True)
-    with open(filepath, "w") as f:
-        for key, value in packages.items():
-            f.write(f"\n\n--- <{key}> ---\n")
-            if not value[1]:
-                f.write("No failures\n")
-                continue
-            for r in value[1]:
-                f.write(r.detail + "\n")
+            if config.FAIL_FAST and any(not isinstance(r, TestOk) for r in rs):
+                print(f"\n{HEADER}Stopped at the first failure{ENDC}")
+                break
+    reporter.finish(results)
+    history.update(results)
+
+
+def merge_results(filepaths):
+    """!
+    Merge the json lines result files of shards into the standard reports.
+    """
+    reporter = reporters.get_reporters(["merged"])
+    results = list()
+    for filepath in filepaths:
+        print(f"{HEADER}Merge <{filepath}>...{ENDC}")
+        rs = reporters.read_jsonl(filepath)
+        reporter.results(rs)
+        results.extend(rs)
+    reporter.finish(results)
+    history.update(results)
+
+
+def result_from_dict(d):
+    """!
+    Rebuild a test result from its dict, eg. when received from a worker.
+    """
+    cls = d["status"] == "ok" and TestOk or TestFail
+    r = cls(d["package"], d["name"])
+    if d.get("log_digest"):
+        r._log, r._log_digest = None, d["log_digest"]
+    else:
+        r.log = d["log"]  # spilled again if large
+    r.case = d.get("case")
+    r.timings = [tuple(t) for t in d.get("timings", ())]
+    return r
 
 
 class _TestResult:
+    """!
+    Test result, its log over config.LOG_SPILL_SIZE chars is kept in the log store.
+    """
+
+    __slots__ = ("package", "name", "_log", "_log_digest", "case", "timings")
+
     def __init__(self, package, name, log=None):
         self.package = package
         self.name = name
         self.log = log
+        self.case = None  # key of its case
+        self.timings = ()  # (phase, wall, cpu), of its case phases
+
+    @property
+    def log(self):
+        if self._log_digest:
+            return logstore.get(self._log_digest)
+        return self._log
+
+    @log.setter
+    def log(self, log):
+        if log and len(log) > config.LOG_SPILL_SIZE:
+            self._log, self._log_digest = None, logstore.put(log)
+        else:
+            self._log, self._log_digest = log, None
 
     def __str__(self):
         return self.label
 
+    def to_dict(self, inline_log=False):
+        # inline_log when persisted, as the log store is in the throwaway log dir
+        return {
+            "status": isinstance(self, TestOk) and "ok" or "fail",
+            "package": self.package,
+            "name": self.name,
+            "log": inline_log and self.log or self._log,
+            "log_digest": not inline_log and self._log_digest or None,
+            "case": self.case,
+            "timings": self.timings,
+        }
+
     @property
     def label(self):
         # return f"{self.package}:\n{self.name[:28]}···{self.name[len(self.name) - 76 :]}"
@@ -84,17 +200,20 @@ class _TestResult:
 
 
 class TestOk(_TestResult):
-    def __init__(self, package, name, log=None):
-        super().__init__(package, name, log)
-        # print(end=f"{OKGREEN}Ok {ENDC}")
-        print(f"{OKGREEN}{self.detail}{ENDC}")
+    __slots__ = ()
 
 
 class TestFail(_TestResult):
-    def __init__(self, package, name, log=None):
-        super().__init__(package, name, log)
-        # print(end=f"{FAIL}Fail {ENDC}")
-        print(f"{FAIL}{self.detail}{ENDC}")
+    __slots__ = ()
+
+
+class TestEnvFail(TestFail):
+    """!
+    Failure caused by the environment, eg. an fds timeout on a loaded machine,
+    its case results are not cached.
+    """
+
+    __slots__ = ()
 
 
 class TestException(Exception):
@@ -0,0 +1,100 @@
+"""!
+Wall and cpu time of the phases of each case, attached to its results.
+Cpu time is of this process, eg. Blender, not of its subprocesses.
+"""
+
+import contextlib, time
+from collections import defaultdict
+
+_timings = None  # (phase, wall, cpu) of the running case
+
+
+@contextlib.contextmanager
+def recording():
+    """!
+    Record the timings of the phases of the running case.
+    """
+    global _timings
+    _timings = list()
+    try:
+        yield _timings
+    finally:
+        _timings = None
+
+
+@contextlib.contextmanager
+def phase(name, timings=None, cpu=True):
+    """!
+    Time a phase, appending its (name, wall, cpu) to timings or to the running case.
+    """
+    if timings is None:
+        timings = _timings
+    t0, c0 = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings.append(
+                (
+                    name,
+                    time.perf_counter() - t0,
+                    time.process_time() - c0 if cpu else None,
+                )
+            )
+
+
+def get_cases(results) -> dict:
+    """!
+    Get the phase timings of the cases of results, by case key.
+    """
+    cases = defaultdict(list)
+    for r in results:
+        if r.case:
+            cases[r.case].extend(r.timings)
+    return cases
+
+
+def get_phases(cases) -> dict:
+    """!
+    Get the total (count, wall, cpu) of each phase of cases, by phase name.
+    """
+    phases = defaultdict(lambda: [0, 0.0, 0.0])
+    for timings in cases.values():
+        for name, wall, cpu in timings:
+            p = phases[name]
+            p[0], p[1], p[2] = p[0] + 1, p[1] + wall, p[2] + (cpu or 0.0)
+    return phases
+
+
+def _total(timings):
+    return sum(wall for _, wall, _ in timings)
+
+
+def get_summary(results, qty=10) -> list:
+    """!
+    Get the summary lines of the slowest cases and phases.
+    """
+    cases = get_cases(results)
+    lines = [f"Slowest cases (of {len(cases)}):"]
+    for key in sorted(cases, key=lambda k: _total(cases[k]), reverse=True)[:qty]:
+        lines.append(f"{_total(cases[key]):>9.3f} s  {key}")
+    lines.append("Slowest phases:")
+    phases = get_phases(cases)
+    for name, (n, wall, cpu) in sorted(
+        phases.items(), key=lambda i: i[1][1], reverse=True
+    )[:qty]:
+        lines.append(f"{wall:>9.3f} s  {name} (x{n}, cpu {cpu:.3f} s)")
+    return lines
+
+
+def get_table(results) -> list:
+    """!
+    Get the table lines of the timings of all phases of all cases.
+    """
+    lines = [f"{'wall s':>9} {'cpu s':>9}  case / phase"]
+    for key, timings in get_cases(results).items():
+        lines.append(f"{_total(timings):>9.3f} {'':>9}  {key}")
+        for name, wall, cpu in timings:
+            cpu = cpu is None and "-" or f"{cpu:.3f}"
+            lines.append(f"{wall:>9.3f} {cpu:>9}    {name}")
+    return lines
@@ -0,0 +1,102 @@
+"""!
+Watchdog of the running case: over its time budget the case fails
+with the stack of where its time went, and it is interrupted.
+If it does not stop, eg. stuck in Blender C code holding the GIL,
+all stacks are dumped by faulthandler, and the process of a supervised
+worker exits, to be replaced by its supervisor.
+"""
+
+import contextlib, faulthandler, signal, sys, threading, traceback
+from . import config, testing
+
+## First line of the dump of a stuck case, see faulthandler
+DUMP_HEAD = "Timeout ("
+
+_exit = False  # exit on a stuck case, when supervised
+
+
+class CaseTimeout(BaseException):
+    """!
+    Interrupt of a case over its time budget, not caught by its except Exception.
+    """
+
+
+def set_exit(exit=True):
+    """!
+    Exit the process on a stuck case, only when a supervisor replaces it.
+    """
+    global _exit
+    _exit = exit
+
+
+def get_timeout(package):
+    """!
+    Get the case time budget of the test module package,
+    its CASE_TIMEOUT or config.CASE_TIMEOUT.
+    """
+    module = sys.modules.get(package)
+    return getattr(module, "CASE_TIMEOUT", config.CASE_TIMEOUT)
+
+
+def get_dump(text):
+    """!
+    Get the last dump of a stuck case from the process output text, or None.
+    """
+    start = text.rfind(DUMP_HEAD)
+    if start >= 0 and (start == 0 or text[start - 1] == "\n"):
+        return text[start:]
+
+
+@contextlib.contextmanager
+def watching(package, key, timings=()):
+    """!
+    Watch the case key of package, running in this thread, with its phase timings.
+    Yield the list of its timeout failure, if expired.
+    """
+    timeout = get_timeout(package)
+    if not timeout:
+        yield list()
+        return
+    expired, running = list(), [True]
+    ident = threading.get_ident()
+    can_interrupt = threading.current_thread() is threading.main_thread() and hasattr(
+        signal, "pthread_kill"
+    )
+
+    def expire():
+        frame = sys._current_frames().get(ident)
+        stack = frame and "".join(traceback.format_stack(frame)) or "Unavailable\n"
+        phases = "".join(f"{name}: {wall:.3f} s\n" for name, wall, _ in list(timings))
+        log = (
+            f"Case over its time budget of {timeout} s, interrupted\n"
+            f"Completed phases:\n{phases or 'None'}\n"
+            f"Stack:\n{stack}"
+        )
+        expired.append(testing.TestFail(package, f"Case timeout: <{key}>", log))
+        if can_interrupt:
+            signal.pthread_kill(ident, signal.SIGUSR1)
+
+    def interrupt(signum, frame):
+        if running[0]:
+            raise CaseTimeout()
+
+    timer = threading.Timer(timeout, expire)
+    timer.daemon = True
+    if can_interrupt:
+        handler = signal.signal(signal.SIGUSR1, interrupt)
+    faulthandler.dump_traceback_later(
+        timeout + config.CASE_TIMEOUT_GRACE, exit=_exit, file=sys.__stderr__
+    )
+    timer.start()
+    try:
+        try:
+            yield expired
+        finally:
+            running[0] = False  # no more interrupts
+    except CaseTimeout:
+        pass
+    finally:
+        faulthandler.cancel_dump_traceback_later()
+        timer.cancel()
+        if can_interrupt:
+            signal.signal(signal.SIGUSR1, handler)
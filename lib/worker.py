@@ -0,0 +1,129 @@
+"""!
+Serve test requests inside a Blender worker, one json message per line.
+"""
+
+import functools, importlib, json, os, threading, traceback
+from . import config, testing, scheduler
+from .testing import TestFail
+
+## Prefix of protocol lines, to separate them from other Blender output
+MARKER = "@@bfds "
+
+## Environment variable of the protocol pipe file descriptor of a worker
+FD_ENV = "BFDS_WORKER_FD"
+
+_lock = threading.Lock()  # messages are sent by the threads of deferred results too
+_cond = threading.Condition()
+_pending = 0  # deferred results not sent yet
+
+
+def send(wfile, msg):
+    """!
+    Send a protocol message.
+    """
+    with _lock:
+        wfile.write(f"\n{MARKER}{json.dumps(msg)}\n")
+        wfile.flush()
+
+
+def get_wfile(default):
+    """!
+    Get the protocol pipe of a worker, apart from its other output, or default.
+    """
+    fd = os.environ.get(FD_ENV)
+    if fd is None:
+        return default
+    return os.fdopen(int(fd), "w", encoding="utf-8")
+
+
+def receive(line):
+    """!
+    Get the protocol message from a line, or None if it is other output.
+    """
+    if line.startswith(MARKER):
+        return json.loads(line[len(MARKER) :])
+
+
+def _collect(modules) -> dict:
+    return {m: testing.collect_module(importlib.import_module(m)) for m in modules}
+
+
+def _run(module, case_keys, futures) -> list:
+    try:
+        item = importlib.import_module(module)
+        return testing.run_module(item, case_keys, futures=futures)
+    except Exception:
+        return [TestFail(module, f"Run <{module}>", traceback.format_exc())]
+
+
+def _send_deferred(wfile, module, item, n, future):
+    """!
+    Send the n-th deferred results of a work item, when done.
+    """
+    global _pending
+    try:
+        results = future.result()
+    except Exception:
+        results = [TestFail(module, f"Deferred <{module}>", traceback.format_exc())]
+    send(
+        wfile,
+        {
+            "op": "deferred",
+            "item": item,
+            "n": n,
+            "results": [r.to_dict() for r in results],
+        },
+    )
+    with _cond:
+        _pending -= 1
+        _cond.notify_all()
+
+
+def serve(rfile, wfile, reset=None) -> bool:
+    """!
+    Serve requests from rfile and send responses to wfile, until quit.
+    Call reset before each run, for isolation. Return True on shutdown request.
+    The deferred results of a run, eg. fds runs, are sent when done,
+    while the next runs go on, up to one pending per core of the fds budget.
+    """
+    global _pending
+    send(wfile, {"op": "ready"})
+    shutdown = False
+    for line in rfile:
+        request = json.loads(line)
+        for name, value in request.get("config", dict()).items():
+            setattr(config, name, value)
+        if request["op"] == "collect":
+            send(wfile, {"op": "collected", "cases": _collect(request["modules"])})
+        elif request["op"] == "run":
+            with _cond:
+                _cond.wait_for(lambda: _pending < scheduler.get_budget())
+            if reset:
+                reset()
+            module, futures = request["module"], list()
+            results = _run(module, request["cases"], futures)
+            with _cond:
+                _pending += len(futures)
+            send(
+                wfile,
+                {
+                    "op": "results",
+                    "item": request.get("item"),
+                    "results": [r.to_dict() for r in results],
+                    "deferred": len(futures),
+                },
+            )
+            for n, future in enumerate(futures):
+                future.add_done_callback(
+                    functools.partial(
+                        _send_deferred, wfile, module, request.get("item"), n
+                    )
+                )
+        elif request["op"] == "quit":
+            break
+        elif request["op"] == "shutdown":
+            shutdown = True
+            break
+    with _cond:
+        _cond.wait_for(lambda: not _pending)
+    return shutdown
@@ -20,6 +20,6 @@ def run():
         exclude_dirs=EXCLUDE_DIRS,
         exclude_files=EXCLUDE_FILES,
         ref_path=os.path.join(current_path, REF_PATH),
-        run_fds=False,  # TODO
+        run_fds=config.RUN_FDS,
         set_ref=config.SET_REF,
     )
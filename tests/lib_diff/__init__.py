@@ -0,0 +1,62 @@
+"""!
+Test the line diff matcher on random line lists, without Blender.
+"""
+
+import random
+from lib import config
+from lib.diff import diff_lines, _get_matches, _get_myers_matches
+from lib.testing import TestOk, TestFail
+
+## Number of random line list pairs
+SAMPLES = 300
+
+
+def _get_lcs_length(a, b) -> int:
+    """!
+    Get the length of the longest common subsequence, by dynamic programming.
+    """
+    row = [0] * (len(b) + 1)
+    for x in a:
+        diag = 0
+        for j, y in enumerate(b, 1):
+            up = row[j]
+            row[j] = diag + 1 if x == y else max(up, row[j - 1])
+            diag = up
+    return row[-1]
+
+
+def _check(a, b) -> str:
+    """!
+    Check the matcher invariants, return the broken one or an empty string.
+    """
+    matches = list()
+    _get_matches(a, 0, len(a), b, 0, len(b), config.DIFF_MAX_EDITS, matches)
+    if any(a[i] != b[j] for i, j in matches):
+        return "Matched lines differ"
+    if any(i0 >= i1 or j0 >= j1 for (i0, j0), (i1, j1) in zip(matches, matches[1:])):
+        return "Matches not increasing"
+    if len(diff_lines(a, b)) != len(a) + len(b) - 2 * len(matches):
+        return "Diff lines are not the unmatched lines"
+    if len(_get_myers_matches(a, b, len(a) + len(b))) != _get_lcs_length(a, b):
+        return "Myers matches are not a longest common subsequence"
+    return str()
+
+
+def _get_line(rnd) -> str:
+    if rnd.random() < 0.2:
+        return f"&OBST ID='Box{rnd.randrange(20)}' /"  # often unique, an anchor
+    return rnd.choice(("&TAIL /", "", "! header", "&SURF ID='INERT' /"))
+
+
+def run():
+    name = "Diff matcher invariants"
+    rnd = random.Random(0)  # repeatable
+    for i in range(SAMPLES):
+        a = [_get_line(rnd) for _ in range(rnd.randrange(40))]
+        b = [l for l in a if rnd.random() < 0.8]  # similar, as exported cases
+        for _ in range(rnd.randrange(5)):
+            b.insert(rnd.randrange(len(b) + 1), _get_line(rnd))
+        log = _check(a, b) or diff_lines(a, list(a)) and "Same lines differ"
+        if log:
+            return TestFail(__package__, name, f"{log}, sample {i}:\n{a}\n{b}")
+    return TestOk(__package__, name)
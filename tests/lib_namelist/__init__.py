@@ -0,0 +1,75 @@
+"""!
+Test the namelist comparator on reordered records and tolerances, without Blender.
+"""
+
+import os, tempfile
+from lib import namelist
+from lib.testing import TestOk, TestFail
+
+REF_CASE = """! header, ignored
+&HEAD CHID='room' /
+&MESH ID='M1' IJK=10,10,10 XB=0,1,0,1,0,1 /
+&MESH IJK=10,10,10 XB=1,2,0,1,0,1 /
+&OBST ID='B' XB=0,0.2,0,0.2,0,0.5
+  SURF_ID='INERT' /
+&VENT XB=0,0,0,1,0,1 SURF_ID='OPEN' /
+&VENT XB=2,2,0,1,0,1 SURF_ID='OPEN' /
+&TAIL /
+"""
+
+## Name, fds case compared with REF_CASE, expected line of the log or None
+CASES = (
+    (
+        "Reordered records and rounding",
+        """! header, changed
+&HEAD CHID='room' /
+&MESH ID='M1' IJK=10,10,10 XB=0,1,0,1,0,1 /
+&MESH IJK=10,10,10 XB=1,2.0000000001,0,1,0,1 /
+&VENT XB=2,2,0,1,0,1 SURF_ID='OPEN' /
+&VENT XB=0,0,0,1,0,1 SURF_ID='OPEN' /
+&OBST ID='B' SURF_ID='INERT' XB=0,0.2,0,0.2,0,0.5 /
+&TAIL /
+""",
+        None,
+    ),
+    (
+        "Changed value",
+        REF_CASE.replace("0,0.2,0,0.2,0,0.5", "0,0.2,0,0.2,0,0.6"),
+        "&OBST ID='B': XB changed: 0.0,0.2,0.0,0.2,0.0,0.5 -> 0.0,0.2,0.0,0.2,0.0,0.6",
+    ),
+    (
+        "Reordered MESH records",
+        """&HEAD CHID='room' /
+&MESH IJK=10,10,10 XB=1,2,0,1,0,1 /
+&MESH ID='M1' IJK=10,10,10 XB=0,1,0,1,0,1 /
+&OBST ID='B' XB=0,0.2,0,0.2,0,0.5 SURF_ID='INERT' /
+&VENT XB=0,0,0,1,0,1 SURF_ID='OPEN' /
+&VENT XB=2,2,0,1,0,1 SURF_ID='OPEN' /
+&TAIL /
+""",
+        "&MESH: order changed, reference records: [2, 1]",
+    ),
+    (
+        "Missing record",
+        REF_CASE.replace("&VENT XB=2,2,0,1,0,1 SURF_ID='OPEN' /\n", ""),
+        "&VENT (line 8): missing",
+    ),
+)
+
+
+def run():
+    results = list()
+    with tempfile.TemporaryDirectory() as path:
+        ref_filepath = os.path.join(path, "ref.fds")
+        filepath = os.path.join(path, "case.fds")
+        with open(ref_filepath, "w") as f:
+            f.write(REF_CASE)
+        for name, case, expected in CASES:
+            with open(filepath, "w") as f:
+                f.write(case)
+            log = namelist.compare(ref_filepath, filepath)
+            if log.splitlines() == (expected and [expected] or list()):
+                results.append(TestOk(__package__, name))
+            else:
+                results.append(TestFail(__package__, name, f"Log:\n{log}"))
+    return results
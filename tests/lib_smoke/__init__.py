@@ -0,0 +1,87 @@
+"""!
+Test the rewriting of fds cases for smoke runs, without Blender.
+"""
+
+import os, tempfile
+from lib import config, namelist, smoke
+from lib.testing import TestOk, TestFail
+
+## Name, fds case, expected rewritten case lines, by config.FDS_SMOKE_* defaults
+CASES = (
+    (
+        "Insert &TIME and &DUMP after &HEAD",
+        """! header
+&HEAD CHID='room' /
+&MESH IJK=10,10,10 XB=0,1,0,1,0,1 /
+&SLCF PBX=0.5 QUANTITY='TEMPERATURE' /
+&TAIL /
+""",
+        [
+            "! header",
+            "&HEAD CHID='room' /",
+            "&TIME T_END=0.01 DT=0.002 LOCK_TIME_STEP=T /",
+            "&DUMP NFRAMES=1 /",
+            "&MESH IJK=10,10,10 XB=0,1,0,1,0,1 /",
+            "&TAIL /",
+        ],
+    ),
+    (
+        "Override &TIME and &DUMP in place",
+        """&HEAD CHID='room' /
+&TIME T_BEGIN=1
+  T_END=100 /
+&DUMP DT_RESTART=10 NFRAMES=1000 /
+&TAIL /
+""",
+        [
+            "&HEAD CHID='room' /",
+            "&TIME T_BEGIN=1 T_END=1.01 DT=0.002 LOCK_TIME_STEP=T /",
+            "&DUMP DT_RESTART=10 NFRAMES=1 /",
+            "&TAIL /",
+        ],
+    ),
+)
+
+
+def _is_same(lines0, lines1) -> bool:
+    """!
+    Check if the lines have the same text and namelist records,
+    floats compared with a tolerance.
+    """
+    spans0, spans1 = dict(), dict()
+    for lines, spans in ((lines0, spans0), (lines1, spans1)):
+        for start, end, body in namelist.iter_spans(lines):
+            spans[start] = namelist._parse(body, start)
+    if spans0.keys() != spans1.keys():
+        return False
+    for start, n0 in spans0.items():
+        n1 = spans1[start]
+        if n0.group != n1.group or not namelist._is_match(n0, n1, 1e-9, 1e-9):
+            return False
+    return all(
+        l0 == l1 for i, (l0, l1) in enumerate(zip(lines0, lines1), 1) if i not in spans0
+    )
+
+
+def run():
+    results = list()
+    defaults = (config.FDS_SMOKE_TIME, config.FDS_SMOKE_STEPS, config.FDS_SMOKE_DROP)
+    config.FDS_SMOKE_TIME, config.FDS_SMOKE_STEPS = 0.01, 5
+    config.FDS_SMOKE_DROP = ("SLCF", "BNDF", "ISOF", "PROF")
+    try:
+        with tempfile.TemporaryDirectory() as path:
+            filepath = os.path.join(path, "case.fds")
+            for name, case, expected in CASES:
+                with open(filepath, "w") as f:
+                    f.write(case)
+                smoke.write_smoke_case(filepath)
+                with open(filepath, "r") as f:
+                    lines = f.read().splitlines()
+                if len(lines) == len(expected) and _is_same(expected, lines):
+                    results.append(TestOk(__package__, name))
+                else:
+                    log = "Rewritten case:\n" + "\n".join(lines)
+                    results.append(TestFail(__package__, name, log))
+    finally:
+        config.FDS_SMOKE_TIME, config.FDS_SMOKE_STEPS, config.FDS_SMOKE_DROP = defaults
+    return results
@@ -20,10 +20,10 @@
 Automatic verification script for continous integration.
 """
 
-import sys, os
+import sys, os, argparse
 
 sys.path.insert(0, os.path.dirname(__file__))
-from lib import run_blender, testing, config
+from lib import run_blender, testing, config, shard
 
 try:
     import bpy
@@ -33,17 +33,235 @@ except ImportError:
 BLENDER_PATHFILE = "./blender"
 TEST_PY_MODULE = "tests"
 
+
+def positive_int(text) -> int:
+    n = int(text)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"not a positive integer: <{text}>")
+    return n
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Verify BlenderFDS.")
+    parser.add_argument(
+        "test_names", nargs="*", help="run only tests containing these names"
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="list the tests, without Blender"
+    )
+    parser.add_argument(
+        "--shard",
+        type=shard.parse,
+        metavar="I/N",
+        help="run only the cases of shard I of N, eg. on CI node I",
+    )
+    parser.add_argument(
+        "--merge",
+        nargs="+",
+        metavar="JSONL",
+        help="merge the .jsonl result files of shards into the standard reports",
+    )
+    parser.add_argument(
+        "--update-manifests",
+        action="store_true",
+        help="update the manifests of reference dirs edited by hand, without Blender",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=positive_int, default=1, help="number of Blender workers"
+    )
+    parser.add_argument(
+        "--serve", action="store_true", help="start a persistent Blender server"
+    )
+    parser.add_argument(
+        "--server", action="store_true", help="run tests on the persistent server"
+    )
+    parser.add_argument(
+        "--shutdown-server", action="store_true", help="shut the server down"
+    )
+    parser.add_argument(
+        "--affected",
+        nargs="?",
+        const="HEAD",
+        metavar="BASE_REF",
+        help="run only cases affected by changes since git BASE_REF (default HEAD)",
+    )
+    parser.add_argument(
+        "--compare",
+        choices=("text", "namelist"),
+        help="compare fds files by text lines or by namelist records",
+    )
+    parser.add_argument(
+        "--smoke",
+        action="store_true",
+        help="smoke run fds: a few time steps, no heavy outputs",
+    )
+    parser.add_argument(
+        "--memory",
+        action="store_true",
+        help="track the memory left by each case, and write its timeline",
+    )
+    parser.add_argument(
+        "--persistence-check",
+        action="store_true",
+        help="save and reopen all imported cases before exporting them",
+    )
+    parser.add_argument(
+        "--failed-first",
+        action="store_true",
+        help="run the cases that failed last first, instead of the longest first",
+    )
+    parser.add_argument(
+        "--fail-fast", action="store_true", help="stop the run at the first failure"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="do not use cached case results"
+    )
+    parser.add_argument(
+        "--bench",
+        action="store_true",
+        help="benchmark import and export time against the baseline",
+    )
+    parser.add_argument(
+        "--set-baseline", action="store_true", help="set the bench baseline"
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="count",
+        default=0,
+        help="show all results in full on console",
+    )
+    parser.add_argument(
+        "-q", "--quiet", action="store_true", help="show only the summary on console"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="resume an interrupted run, skipping the cases it completed",
+    )
+    parser.add_argument(
+        "--no-supervisor",
+        action="store_true",
+        help="run in a single Blender, not replaced if it crashes, without journal",
+    )
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(run_blender.get_user_args())
+
+
+def get_config_overrides(args):
+    overrides = dict()
+    if args.no_cache:
+        overrides["CACHE"] = False
+    if args.compare:
+        overrides["COMPARE_MODE"] = args.compare
+    if args.smoke:
+        overrides["FDS_SMOKE"] = True
+    if args.memory:
+        overrides["MEMORY"] = True
+    if args.failed_first:
+        overrides["FAILED_FIRST"] = True
+    if args.fail_fast:
+        overrides["FAIL_FAST"] = True
+    if args.shard:
+        overrides["SHARD"] = args.shard
+    if args.persistence_check:
+        overrides["PERSISTENCE_CHECK"] = 1.0
+    if args.verbose or args.quiet:
+        overrides["VERBOSITY"] = 0 if args.quiet else 1 + args.verbose
+    return overrides
+
+
+def confirm_set_ref():
+    confirm = "Y"
+    if config.SET_REF:
+        confirm = input("\n\nWARNING: Setting references, are you sure? (Y/N) ")
+    return confirm in ("Y", "y")
+
+
 if __name__ == "__main__":
 
+    args = get_args()
+    config_overrides = get_config_overrides(args)
+    for name, value in config_overrides.items():
+        setattr(config, name, value)
+
+    if args.list:
+        testing.list_tests(TEST_PY_MODULE, requested_test_names=args.test_names)
+        exit(0)
+
+    if args.update_manifests:
+        from lib import refstore
+
+        for path in refstore.update_manifests(TEST_PY_MODULE):
+            print(f"Updated: <{path}>")
+        exit(0)
+
+    if args.merge:
+        testing.merge_results(args.merge)
+        exit(0)
+
+    if args.shutdown_server:
+        from lib import server
+
+        server.shutdown_server()
+        exit(0)
+
+    if args.server:
+        from lib import server
+
+        if confirm_set_ref():
+            server.run_on_server(
+                test_py_module=TEST_PY_MODULE,
+                requested_test_names=args.test_names,
+                config_overrides=config_overrides,
+                affected_base=args.affected,
+            )
+        exit(0)
+
+    supervised = not (args.no_supervisor or args.bench or args.serve)
+    if supervised and not run_blender.in_blender():
+        from lib import pool
+
+        if confirm_set_ref():
+            pool.run_pool(
+                script_pathfile=os.path.abspath(__file__),
+                blender_pathfile=BLENDER_PATHFILE,
+                test_py_module=TEST_PY_MODULE,
+                requested_test_names=args.test_names,
+                jobs=args.jobs,
+                config_overrides=config_overrides,
+                affected_base=args.affected,
+                resume=args.resume,
+            )
+        exit(0)
+
     run_blender.run_script_in_blender(
         script_pathfile=os.path.abspath(__file__),  # myself
         blender_pathfile=BLENDER_PATHFILE,
     )
 
-    confirm = "Y"
-    if config.SET_REF:
-        confirm = input("\n\nWARNING: Setting references, are you sure? (Y/N) ")
-    if confirm in ("Y", "y"):
+    if args.worker:
+        from lib import worker, watchdog
+
+        watchdog.set_exit()  # replaced by its supervisor when stuck
+        worker.serve(sys.stdin, worker.get_wfile(sys.stdout))
+    elif args.serve:
+        from lib import server, bl_io
+
+        server.serve(test_py_module=TEST_PY_MODULE, reset=bl_io.open_blend_file)
+    elif args.bench:
+        from lib import bench
+
+        sys.exit(
+            bench.run_bench(
+                test_py_module=TEST_PY_MODULE,
+                requested_test_names=args.test_names,
+                set_baseline=args.set_baseline,
+            )
+        )
+    elif confirm_set_ref():
         testing.run_tests(
-            test_py_module=TEST_PY_MODULE, requested_test_names=sys.argv[5:]
+            test_py_module=TEST_PY_MODULE,
+            requested_test_names=args.test_names,
+            affected_base=args.affected,
         )